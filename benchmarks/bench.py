@@ -0,0 +1,133 @@
+"""Нагрузочные прогоны yatube.
+
+    python benchmarks/bench.py seed --posts 100000 --users 5000
+    python benchmarks/bench.py run --requests 2000 --concurrency 8 \\
+        --baseline benchmarks/baseline.json
+
+Подробности в benchmarks/README.md.
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'yatube'), ROOT]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+
+from benchmarks import dataset, load  # noqa: E402
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in load.DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'Неизвестный сценарий {name}')
+        mix[name] = float(weight or load.DEFAULT_MIX[name])
+    return mix
+
+
+def print_report(report):
+    total = report['total']
+    print(f'Всего: {total["requests"]} запросов, {total["rps"]} rps, '
+          f'потоков {total["concurrency"]}, режим {total["mode"]}')
+    header = ('сценарий', 'запросов', 'ошибок', 'rps', 'p50 мс', 'p95 мс',
+              'p99 мс', 'SQL')
+    print(('{:<14}' + '{:>10}' * 7).format(*header))
+    for name, row in report['scenarios'].items():
+        print(('{:<14}' + '{:>10}' * 7).format(
+            name, row['requests'], row['errors'], row['rps'], row['p50_ms'],
+            row['p95_ms'], row['p99_ms'],
+            '-' if row['queries'] is None else row['queries']
+        ))
+
+
+def seed_command(options):
+    if os.path.exists(options.db_name) and not options.force:
+        sys.exit(f'{options.db_name} уже есть, добавьте --force')
+    if os.path.exists(options.db_name):
+        os.remove(options.db_name)
+    call_command('migrate', verbosity=0)
+    dataset.seed(
+        posts=options.posts, users=options.users, groups=options.groups,
+        comments=options.comments, follows_per_user=options.follows,
+        exponent=options.exponent, seed=options.seed
+    )
+
+
+def run_command(options):
+    report = load.run(
+        requests=options.requests, concurrency=options.concurrency,
+        mix=options.mix, warmup=options.warmup, url=options.url,
+        seed=options.seed
+    )
+    print_report(report)
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+    if options.baseline and not options.save_baseline:
+        with open(options.baseline) as source:
+            problems = load.compare(report, json.load(source),
+                                    options.tolerance)
+        for problem in problems:
+            print(f'РЕГРЕССИЯ {problem}')
+        if problems:
+            sys.exit(1)
+    if options.save_baseline:
+        with open(options.baseline, 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+def main():
+    from django.conf import settings
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.set_defaults(db_name=settings.DATABASES['default']['NAME'])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='Заполнить базу прогона')
+    seed.add_argument('--posts', type=int, default=10000)
+    seed.add_argument('--users', type=int, default=1000)
+    seed.add_argument('--groups', type=int, default=50)
+    seed.add_argument('--comments', type=int, default=None,
+                      help='По умолчанию половина числа постов')
+    seed.add_argument('--follows', type=int, default=20,
+                      help='Характерное число подписок пользователя')
+    seed.add_argument('--exponent', type=float, default=1.1,
+                      help='Показатель степенного закона популярности')
+    seed.add_argument('--seed', type=int, default=0)
+    seed.add_argument('--force', action='store_true',
+                      help='Пересоздать существующую базу')
+    seed.set_defaults(handler=seed_command)
+
+    run = commands.add_parser('run', help='Прогнать нагрузку')
+    run.add_argument('--requests', type=int, default=500)
+    run.add_argument('--concurrency', type=int, default=4)
+    run.add_argument('--warmup', type=int, default=50)
+    run.add_argument('--mix', type=parse_mix, default=None,
+                     help='Например index=5,post_detail=2')
+    run.add_argument('--url', default=None,
+                     help='Адрес запущенного сервера вместо тестового '
+                          'клиента')
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--output', help='Куда записать отчёт в JSON')
+    run.add_argument('--baseline', help='Эталонный отчёт для сравнения')
+    run.add_argument('--save-baseline', action='store_true',
+                     help='Записать отчёт в --baseline вместо сравнения')
+    run.add_argument('--tolerance', type=float, default=0.25,
+                     help='Допустимый рост p95 относительно эталона')
+    run.set_defaults(handler=run_command)
+
+    options = parser.parse_args()
+    options.handler(options)
+
+
+if __name__ == '__main__':
+    main()
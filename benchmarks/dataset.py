@@ -0,0 +1,166 @@
+"""Синтетический набор данных для нагрузочных прогонов.
+
+Пользователи и группы создаются mixer, тексты — Faker. Посты, подписки
+и комментарии пишутся пачками через bulk_create в обход сигналов,
+поэтому производные данные (ленты подписок, счётчики, поисковый
+индекс) после заливки пересчитываются целиком.
+"""
+import itertools
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+from posts.models import (AuthorStats, Comment, Follow, Group, Post,
+                          TimelineEntry)
+from posts.search import get_backend as get_search_backend
+from posts.timeline import celebrity_authors
+from posts.transfer import bulk_create_posts
+
+User = get_user_model()
+
+BATCH_SIZE = 10000
+TEXT_POOL_SIZE = 1000
+
+
+class PowerLaw:
+    """Выбор автора с вероятностью, убывающей как 1 / rank ** exponent."""
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        self.rng = rng
+        weights = [1 / (rank ** exponent)
+                   for rank in range(1, len(self.items) + 1)]
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def choose(self, k=1):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights,
+                                k=k)
+
+    def sample(self, k, exclude=None):
+        """До k разных элементов, кроме exclude."""
+        chosen = set()
+        for _ in range(k * 4):
+            if len(chosen) >= k:
+                break
+            item = self.choose()[0]
+            if item != exclude:
+                chosen.add(item)
+        return chosen
+
+
+def bulk_insert(model, objects, log, create=None):
+    if create is None:
+        def create(batch):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+    total = 0
+    for batch in iter(lambda: list(itertools.islice(objects, BATCH_SIZE)),
+                      []):
+        create(batch)
+        total += len(batch)
+        log(f'  {model.__name__}: {total}')
+    return total
+
+
+def seed(posts=10000, users=1000, groups=50, comments=None,
+         follows_per_user=20, exponent=1.1, days=365, seed=0, log=print):
+    """Заполняет пустую базу набором заданного масштаба."""
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    if comments is None:
+        comments = posts // 2
+    texts = [fake.paragraph(nb_sentences=rng.randint(1, 6))
+             for _ in range(TEXT_POOL_SIZE)]
+    now = timezone.now()
+
+    log(f'Пользователи: {users}, группы: {groups}')
+    with transaction.atomic():
+        user_ids = [user.pk for user in mixer.cycle(users).blend(
+            User, username=mixer.sequence('bench{0}'))]
+        group_ids = [group.pk for group in mixer.cycle(groups).blend(
+            Group, slug=mixer.sequence('bench-{0}'))]
+    authors = PowerLaw(user_ids, exponent, rng)
+
+    def follow_rows():
+        for user_id in user_ids:
+            # Число подписок тоже распределено по Парето: большинство
+            # читает немногих, единицы — сотни авторов.
+            count = int(follows_per_user * rng.paretovariate(1.5) / 3)
+            for author_id in authors.sample(count, exclude=user_id):
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def post_rows():
+        for author_id in authors.choose(posts):
+            yield Post(
+                author_id=author_id,
+                group_id=rng.choice(group_ids) if rng.random() < 0.3
+                else None,
+                text=rng.choice(texts),
+                pub_date=now - timedelta(seconds=rng.uniform(0,
+                                                             days * 86400)),
+            )
+
+    log('Подписки')
+    bulk_insert(Follow, follow_rows(), log)
+    log('Посты')
+    bulk_insert(Post, post_rows(), log, create=bulk_create_posts)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    log('Комментарии')
+    bulk_insert(Comment, (
+        Comment(post_id=rng.choice(post_ids),
+                author_id=rng.choice(user_ids),
+                text=rng.choice(texts))
+        for _ in range(comments)
+    ), log)
+    rebuild_derived(log)
+
+
+def fill_timelines():
+    """Раскладывает последние посты авторов по лентам подписчиков
+    одним INSERT ... SELECT, как это сделали бы сигналы."""
+    TimelineEntry.objects.all().delete()
+    celebrities = celebrity_authors(
+        Follow.objects.values('author_id').distinct())
+    exclude = ''
+    if celebrities:
+        exclude = 'WHERE f.author_id NOT IN ({})'.format(
+            ', '.join(['%s'] * len(celebrities)))
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            INSERT INTO {TimelineEntry._meta.db_table}
+                (user_id, post_id, author_id, pub_date)
+            SELECT f.user_id, p.id, p.author_id, p.pub_date
+            FROM {Follow._meta.db_table} f
+            JOIN (
+                SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                    PARTITION BY author_id ORDER BY pub_date DESC
+                ) AS position
+                FROM {Post._meta.db_table}
+            ) p ON p.author_id = f.author_id AND p.position <= %s
+            {exclude}
+        ''', [settings.TIMELINE_BACKFILL_SIZE, *celebrities])
+
+
+def rebuild_derived(log=print):
+    """Пересчитывает всё, что обычно поддерживают сигналы."""
+    log('Счётчики авторов')
+    AuthorStats.objects.rebuild()
+    log('Счётчики комментариев')
+    Post.objects.update(comments_count=Coalesce(Subquery(
+        Comment.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post').annotate(total=Count('pk')).values('total')
+    ), 0))
+    log('Ленты подписок')
+    fill_timelines()
+    log('Поисковый индекс')
+    get_search_backend().rebuild()
+    cache.clear()
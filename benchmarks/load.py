@@ -0,0 +1,246 @@
+"""Нагрузка на представления posts и сводка по задержкам и запросам.
+
+Запросы идут либо через тестовый клиент Django в этом же процессе
+(тогда считаются и SQL-запросы), либо по HTTP в запущенный сервер.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# Доля сценария в общей нагрузке: чтения преобладают, как в живой ленте.
+DEFAULT_MIX = {
+    'index': 30,
+    'group_posts': 10,
+    'profile': 15,
+    'post_detail': 25,
+    'follow_index': 15,
+    'post_create': 3,
+    'add_comment': 2,
+}
+SAMPLE_SIZE = 1000
+
+
+class Dataset:
+    """Выборка существующих объектов, по которым строятся адреса."""
+
+    def __init__(self, rng):
+        def sample(queryset):
+            ids = list(queryset.order_by('?')[:SAMPLE_SIZE])
+            if not ids:
+                raise SystemExit('База пуста, сначала выполните seed')
+            return ids
+
+        self.rng = rng
+        self.post_ids = sample(Post.objects.values_list('pk', flat=True))
+        self.slugs = sample(Group.objects.values_list('slug', flat=True))
+        self.usernames = sample(
+            User.objects.filter(user_posts__isnull=False).distinct()
+            .values_list('username', flat=True))
+        self.readers = sample(User.objects.values_list('pk', flat=True))
+
+    def page(self):
+        return {'page': self.rng.randint(1, 5)}
+
+    def request(self, scenario):
+        """(метод, адрес, данные, нужен ли вход) для сценария."""
+        choice = self.rng.choice
+        if scenario == 'index':
+            return 'get', reverse('posts:main_page'), self.page(), False
+        if scenario == 'group_posts':
+            return ('get', reverse('posts:group_list',
+                                   args=[choice(self.slugs)]),
+                    self.page(), False)
+        if scenario == 'profile':
+            return ('get', reverse('posts:profile',
+                                   args=[choice(self.usernames)]),
+                    self.page(), False)
+        if scenario == 'post_detail':
+            return ('get', reverse('posts:post_detail',
+                                   args=[choice(self.post_ids)]),
+                    {}, False)
+        if scenario == 'follow_index':
+            return 'get', reverse('posts:follow_index'), self.page(), True
+        if scenario == 'post_create':
+            return ('post', reverse('posts:post_create'),
+                    {'text': f'Нагрузочный пост {self.rng.random()}'}, True)
+        if scenario == 'add_comment':
+            return ('post', reverse('posts:add_comment',
+                                    args=[choice(self.post_ids)]),
+                    {'text': 'Нагрузочный комментарий'}, True)
+        raise ValueError(f'Неизвестный сценарий {scenario}')
+
+
+class ClientDriver:
+    """Тестовый клиент Django: без сети, но с подсчётом SQL-запросов."""
+
+    def __init__(self, user):
+        self.anonymous = Client()
+        self.client = Client()
+        self.client.force_login(user)
+
+    def send(self, method, url, data, login):
+        client = self.client if login else self.anonymous
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data)
+        return response.status_code, len(queries)
+
+    def close(self):
+        pass
+
+
+class HTTPDriver:
+    """HTTP-клиент requests к запущенному серверу проекта."""
+
+    def __init__(self, user, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.anonymous = requests.Session()
+        self.session = requests.Session()
+        # Сессию создаёт тестовый клиент в общей базе, сервер её примет.
+        client = Client()
+        client.force_login(user)
+        name = settings.SESSION_COOKIE_NAME
+        self.session.cookies.set(name, client.cookies[name].value)
+        self.session.get(self.base_url + reverse('posts:post_create'))
+        self.csrf_token = self.session.cookies.get(settings.CSRF_COOKIE_NAME)
+
+    def send(self, method, url, data, login):
+        session = self.session if login else self.anonymous
+        if method == 'get':
+            response = session.get(self.base_url + url, params=data,
+                                   allow_redirects=False)
+        else:
+            response = session.post(
+                self.base_url + url, data=data, allow_redirects=False,
+                headers={'X-CSRFToken': self.csrf_token or '',
+                         'Referer': self.base_url + url}
+            )
+        return response.status_code, None
+
+    def close(self):
+        self.anonymous.close()
+        self.session.close()
+
+
+def percentile(values, share):
+    """Значение по рангу: доля share выборки не больше него."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1,
+                       int(round(share * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(samples, elapsed):
+    """Сводка по сценариям из списка (сценарий, мс, статус, запросы)."""
+    grouped = defaultdict(list)
+    for sample in samples:
+        grouped[sample[0]].append(sample)
+    report = {}
+    for scenario, rows in sorted(grouped.items()):
+        latencies = [row[1] for row in rows]
+        queries = [row[3] for row in rows if row[3] is not None]
+        report[scenario] = {
+            'requests': len(rows),
+            'errors': sum(1 for row in rows if row[2] >= 400),
+            'rps': round(len(rows) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'queries': (round(sum(queries) / len(queries), 2)
+                        if queries else None),
+        }
+    return report
+
+
+def run(requests=500, concurrency=4, mix=None, warmup=50, url=None, seed=0):
+    """Прогоняет нагрузку и возвращает сводку с общим числом запросов
+    в секунду."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    dataset = Dataset(rng)
+    scenarios = list(mix)
+    weights = [mix[name] for name in scenarios]
+    plan = rng.choices(scenarios, weights=weights, k=warmup + requests)
+    # У каждого потока свой читатель со своей лентой подписок.
+    readers = iter(rng.sample(dataset.readers,
+                              min(len(dataset.readers), concurrency)))
+    lock = threading.Lock()
+    drivers = []
+    local = threading.local()
+    samples = []
+
+    def driver():
+        if not hasattr(local, 'driver'):
+            with lock:
+                user = User.objects.get(pk=next(readers, dataset.readers[0]))
+            local.driver = (HTTPDriver(user, url) if url
+                            else ClientDriver(user))
+            with lock:
+                drivers.append(local.driver)
+        return local.driver
+
+    def call(index, scenario):
+        with lock:
+            request = dataset.request(scenario)
+        started = time.perf_counter()
+        status, queries = driver().send(*request)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if index >= warmup:
+            with lock:
+                samples.append((scenario, elapsed_ms, status, queries))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(warmup), plan[:warmup]))
+        started = time.perf_counter()
+        list(executor.map(call, range(warmup, len(plan)), plan[warmup:]))
+        elapsed = time.perf_counter() - started
+    for opened in drivers:
+        opened.close()
+    return {
+        'total': {
+            'requests': len(samples),
+            'concurrency': concurrency,
+            'rps': round(len(samples) / elapsed, 1),
+            'mode': 'http' if url else 'client',
+        },
+        'scenarios': summarize(samples, elapsed),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Регрессии относительно baseline: рост p95 больше чем на
+    tolerance и любое увеличение числа запросов."""
+    problems = []
+    for scenario, current in report['scenarios'].items():
+        previous = baseline['scenarios'].get(scenario)
+        if previous is None:
+            continue
+        limit = previous['p95_ms'] * (1 + tolerance)
+        if current['p95_ms'] > limit:
+            problems.append(
+                f'{scenario}: p95 {current["p95_ms"]} мс > {limit:.2f} мс'
+            )
+        if (current['queries'] is not None
+                and previous.get('queries') is not None
+                and current['queries'] > previous['queries'] + 0.5):
+            problems.append(
+                f'{scenario}: запросов {current["queries"]} '
+                f'> {previous["queries"]}'
+            )
+        if current['errors'] > previous.get('errors', 0):
+            problems.append(f'{scenario}: ошибок {current["errors"]}')
+    return problems
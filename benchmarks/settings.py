@@ -0,0 +1,26 @@
+"""Настройки проекта для нагрузочных прогонов: отдельная база,
+DEBUG выключен, как в боевом окружении."""
+import os
+
+from yatube.settings import *  # noqa: F401,F403
+from yatube.settings import BASE_DIR
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'BENCH_DB',
+            os.path.join(os.path.dirname(BASE_DIR), 'benchmarks',
+                         'bench.sqlite3')
+        ),
+        # Параллельные записи ждут блокировку, а не падают сразу.
+        'OPTIONS': {'timeout': 30},
+    }
+}
+
+# Фоновые задачи выполняются сразу: прогоны идут без воркеров.
+TASKS_EAGER = True
@@ -0,0 +1,26 @@
+import pytest
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.test.utils import override_settings
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_caches():
+    """Кэш в памяти вместо общего кэша разработки, ещё до создания
+    тестовой базы."""
+    with override_settings(CACHES=django_settings.TEST_CACHES):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def eager_tasks(settings):
+    """Фоновые задачи выполняются в самом запросе: тестам не нужны
+    воркеры, и никто не пишет во временный MEDIA_ROOT, пока фикстура
+    его удаляет."""
+    settings.TASKS_EAGER = True
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(test_caches):
+    """Каждый тест начинает с пустого кэша."""
+    cache.clear()
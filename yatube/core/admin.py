@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import OutboxMessage
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'from_email', 'recipients', 'created',
+                    'claimed_until')
+    search_fields = ('recipients',)
+
+
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        if settings.TEMPLATE_PROFILING:
+            from .metrics import enable_template_profiling
+            enable_template_profiling()
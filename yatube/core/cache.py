@@ -0,0 +1,102 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим кэшем.
+
+Общий уровень — любой кэш из CACHES, его алиас задаётся в LOCATION.
+Прочитанное из него значение на LOCAL_TIMEOUT секунд остаётся в памяти
+воркера, поэтому горячие страницы лент не ходят даже в общий кэш.
+Ключи с префиксами из SHARED_PREFIXES (счётчики поколений лент)
+в памяти не держатся: по ним воркеры узнают об изменениях, и всё,
+что от них зависит, остаётся согласованным между процессами.
+"""
+from django.core.cache import caches
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import CacheMetricsMixin
+
+_missing = object()
+
+
+class BaseTwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = location
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.shared_prefixes = tuple(options.get('SHARED_PREFIXES', ()))
+        self.local = locmem.LocMemCache(f'two-tier:{location}', {
+            'TIMEOUT': self.local_timeout,
+            'OPTIONS': {
+                'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000),
+            },
+        })
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def is_local(self, key):
+        return not key.startswith(self.shared_prefixes)
+
+    def keep_local(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.is_local(key):
+            return
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            timeout = self.local_timeout
+        self.local.set(key, value, min(timeout, self.local_timeout),
+                       version)
+
+    def get(self, key, default=None, version=None):
+        if self.is_local(key):
+            value = self.local.get(key, _missing, version)
+            if value is not _missing:
+                return value
+        value = self.shared.get(key, _missing, version)
+        if value is _missing:
+            return default
+        self.keep_local(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.local.get_many(
+            [key for key in keys if self.is_local(key)], version)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = self.shared.get_many(missing, version)
+            for key, value in fetched.items():
+                self.keep_local(key, value, version=version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.keep_local(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self.keep_local(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(key, version)
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(key, version)
+        self.shared.delete(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+
+class TwoTierCache(CacheMetricsMixin, BaseTwoTierCache):
+    pass
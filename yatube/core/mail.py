@@ -0,0 +1,116 @@
+"""Отправка почты через очередь.
+
+QueuedEmailBackend только записывает письма в таблицу outbox и ставит
+задачу flush_outbox, поэтому запрос, отправивший письмо, не ждёт
+почтового сервера. Задача забирает письма пачками по
+EMAIL_OUTBOX_BATCH и отправляет их бэкендом EMAIL_DELIVERY_BACKEND
+через одно соединение на весь прогон.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from tasks.queue import task
+
+from .models import OutboxMessage
+
+
+class RawMessage:
+    """MIME-текст письма с интерфейсом, который ждут бэкенды Django."""
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    def as_bytes(self, unixfrom=False, linesep='\n'):
+        return linesep.encode().join(self.data.splitlines())
+
+    def get_charset(self):
+        return None
+
+
+class StoredEmail:
+    """Письмо из outbox в виде, пригодном для send_messages."""
+
+    encoding = None
+
+    def __init__(self, row):
+        self.from_email = row.from_email
+        self.to = row.recipients.split('\n')
+        self.data = row.message
+
+    def recipients(self):
+        return self.to
+
+    def message(self):
+        return RawMessage(self.data)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        rows = [
+            OutboxMessage(
+                from_email=message.from_email,
+                recipients='\n'.join(message.recipients()),
+                message=message.message().as_bytes(linesep='\n'),
+            )
+            for message in email_messages if message.recipients()
+        ]
+        if not rows:
+            return 0
+        OutboxMessage.objects.bulk_create(rows)
+        transaction.on_commit(schedule_flush)
+        return len(rows)
+
+
+def schedule_flush():
+    """Ставит рассылку, если её ещё нет в очереди: одна задача
+    разошлёт все накопившиеся письма."""
+    if not flush_outbox.is_queued():
+        flush_outbox.delay()
+
+
+def claim_batch(size):
+    """Закрепляет за вызывающим до size писем на TASKS_LEASE секунд."""
+    now = timezone.now()
+    free = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    ids = list(OutboxMessage.objects.filter(free).values_list(
+        'pk', flat=True)[:size])
+    token = uuid.uuid4().hex
+    OutboxMessage.objects.filter(free, pk__in=ids).update(
+        claimed_by=token,
+        claimed_until=now + timedelta(seconds=settings.TASKS_LEASE)
+    )
+    return list(OutboxMessage.objects.filter(claimed_by=token))
+
+
+@task
+def flush_outbox(batch_size=None):
+    """Отправляет все письма outbox, возвращает число отправленных.
+
+    Отправленные письма удаляются после каждой пачки. Если сервер
+    отказал, остальные письма пачки освобождаются для следующей
+    попытки задачи, а ошибка пробрасывается дальше.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH
+    total = 0
+    with get_connection(settings.EMAIL_DELIVERY_BACKEND) as connection:
+        while True:
+            batch = claim_batch(batch_size)
+            if not batch:
+                return total
+            sent = []
+            try:
+                for row in batch:
+                    connection.send_messages([StoredEmail(row)])
+                    sent.append(row.pk)
+            finally:
+                OutboxMessage.objects.filter(pk__in=sent).delete()
+                OutboxMessage.objects.filter(
+                    pk__in=[row.pk for row in batch]).update(
+                        claimed_by='', claimed_until=None)
+            total += len(sent)
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from core.metrics import (disable_template_profiling,
+                          enable_template_profiling, template_profile)
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Рендерит страницы и выводит время каждого шаблона '
+            'и include, самые дорогие сверху')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Адреса страниц, по умолчанию главная, группа, профиль '
+                 'и пост из базы'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=10,
+            help='Сколько раз запросить каждую страницу'
+        )
+        parser.add_argument(
+            '--user', help='Пользователь, от имени которого идут запросы, '
+                           'с ним проверяется и лента подписок'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Сколько шаблонов вывести'
+        )
+
+    def default_paths(self):
+        paths = [reverse('posts:main_page')]
+        group = Group.objects.first()
+        if group is not None:
+            paths.append(reverse('posts:group_list',
+                                 kwargs={'slug': group.slug}))
+        post = Post.objects.select_related('author').first()
+        if post is not None:
+            paths.append(reverse('posts:profile',
+                                 kwargs={'username': post.author.username}))
+            paths.append(reverse('posts:post_detail',
+                                 kwargs={'post_id': post.pk}))
+        return paths
+
+    def handle(self, *args, **options):
+        client = Client()
+        paths = options['paths'] or self.default_paths()
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}')
+            client.force_login(user)
+            if not options['paths']:
+                paths.append(reverse('posts:follow_index'))
+        enable_template_profiling()
+        template_profile.reset()
+        try:
+            for path in paths:
+                for _ in range(options['requests']):
+                    status = client.get(path).status_code
+                    if status != 200:
+                        raise CommandError(f'{path}: ответ {status}')
+        finally:
+            disable_template_profiling()
+        self.report(template_profile.rows()[:options['limit']])
+
+    def report(self, rows):
+        self.stdout.write(
+            f'{"Шаблон":40} {"Рендеры":>8} {"Всего, мс":>10} '
+            f'{"Свои, мс":>10} {"Свои на рендер":>15}'
+        )
+        for name, count, total, own in rows:
+            self.stdout.write(
+                f'{name:40} {count:8} {total * 1000:10.1f} '
+                f'{own * 1000:10.1f} {own * 1000 / count:15.3f}'
+            )
@@ -0,0 +1,291 @@
+"""Метрики запросов: SQL, рендеринг шаблонов, кэш и общее время.
+
+Замеры текущего запроса копит RequestMetrics, которую заводит
+core.middleware.MetricsMiddleware. Гистограммы по представлениям живут
+в памяти процесса и отдаются в текстовом формате Prometheus.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.template import Template
+from django.template.backends import django as django_backend
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_local = threading.local()
+_missing = object()
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __enter__(self):
+        _local.metrics = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.metrics = None
+        self.total_time = time.perf_counter() - self.started
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """Обёртка для connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_count += 1
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.db_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits '
+            f'{self.cache_misses} misses"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+def current():
+    """Замеры идущего в этом потоке запроса или None."""
+    return getattr(_local, 'metrics', None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Registry:
+    """Гистограммы и счётчики по именам представлений."""
+
+    HISTOGRAMS = {
+        'yatube_request_duration_seconds': (
+            'Время ответа', DURATION_BUCKETS),
+        'yatube_db_duration_seconds': (
+            'Время SQL-запросов за ответ', DURATION_BUCKETS),
+        'yatube_template_duration_seconds': (
+            'Время рендеринга шаблонов за ответ', DURATION_BUCKETS),
+        'yatube_db_queries': (
+            'Число SQL-запросов за ответ', QUERY_BUCKETS),
+    }
+    COUNTERS = {
+        'yatube_cache_hits_total': 'Попадания в кэш',
+        'yatube_cache_misses_total': 'Промахи кэша',
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {
+                name: defaultdict(lambda buckets=buckets: Histogram(buckets))
+                for name, (_, buckets) in self.HISTOGRAMS.items()
+            }
+            self.counters = {name: defaultdict(int) for name in self.COUNTERS}
+
+    def observe(self, view, metrics):
+        values = {
+            'yatube_request_duration_seconds': metrics.total_time,
+            'yatube_db_duration_seconds': metrics.db_time,
+            'yatube_template_duration_seconds': metrics.template_time,
+            'yatube_db_queries': metrics.db_count,
+        }
+        with self.lock:
+            for name, value in values.items():
+                self.histograms[name][view].observe(value)
+            self.counters['yatube_cache_hits_total'][view] += (
+                metrics.cache_hits)
+            self.counters['yatube_cache_misses_total'][view] += (
+                metrics.cache_misses)
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        with self.lock:
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self.histograms[name].items()):
+                    lines.extend(histogram.samples(name, f'view="{view}"'))
+            for name, help_text in self.COUNTERS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for view, value in sorted(self.counters[name].items()):
+                    lines.append(f'{name}{{view="{view}"}} {value}')
+        lines.extend(template_profile.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи get/get_many бэкенда кэша."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        metrics = current()
+        if metrics is not None:
+            if value is _missing:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        metrics = current()
+        if metrics is None:
+            return super().get_many(keys, version)
+        # Базовый get_many ходит через get, эти вызовы не считаем.
+        _local.metrics = None
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            _local.metrics = metrics
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+
+
+class TimedTemplate:
+    """Шаблон, время рендеринга которого попадает в замеры запроса.
+
+    Вложенные рендеринги не складываются с внешним.
+    """
+
+    def __init__(self, template):
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return self._wrapped.render(context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class TemplateProfile:
+    """Число рендерингов и время каждого шаблона, в том числе
+    подключённых через include.
+
+    total — полное время рендеринга, own — за вычетом вложенных
+    шаблонов: по нему видно, какой include дороже всего. Родитель
+    из extends рендерится внутри потомка и входит в его own.
+    """
+
+    METRICS = (
+        ('yatube_template_renders_total', 'Рендеринги шаблона', 1),
+        ('yatube_template_seconds_total',
+         'Время рендеринга шаблона без вложенных', 3),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = defaultdict(lambda: [0, 0.0, 0.0])
+
+    def add(self, name, total, own):
+        with self.lock:
+            row = self.stats[name]
+            row[0] += 1
+            row[1] += total
+            row[2] += own
+
+    def rows(self):
+        """Строки (шаблон, рендеринги, total, own) по убыванию own."""
+        with self.lock:
+            rows = [(name, *row) for name, row in self.stats.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def samples(self):
+        rows = sorted(self.rows())
+        if not rows:
+            return
+        for name, help_text, column in self.METRICS:
+            yield f'# HELP {name} {help_text}'
+            yield f'# TYPE {name} counter'
+            for row in rows:
+                yield f'{name}{{template="{row[0]}"}} {row[column]}'
+
+
+template_profile = TemplateProfile()
+_template_render = Template.render
+
+
+def profiled_render(self, context):
+    stack = _local.__dict__.setdefault('template_stack', [])
+    stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        return _template_render(self, context)
+    finally:
+        total = time.perf_counter() - started
+        nested = stack.pop()
+        if stack:
+            stack[-1] += total
+        template_profile.add(self.name or '<string>', total, total - nested)
+
+
+def enable_template_profiling():
+    """Включает замеры template_profile для всех шаблонов Django."""
+    Template.render = profiled_render
+
+
+def disable_template_profiling():
+    Template.render = _template_render
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблонизатор Django с замером времени рендеринга."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
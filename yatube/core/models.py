@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class OutboxMessage(models.Model):
+    """Письмо, которое ещё не ушло получателям.
+
+    Хранится готовым MIME-текстом, поэтому отправке не нужны ни шаблоны,
+    ни объекты, из которых оно собрано.
+    """
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField()
+    message = models.BinaryField()
+    claimed_by = models.CharField(max_length=32, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('pk',)
+
+    def __str__(self) -> str:
+        return f'{self.from_email} -> {self.recipients}'
@@ -0,0 +1,78 @@
+"""Чтение с реплик базы данных.
+
+Представления, обёрнутые в read_from_replica, читают с одной из реплик
+DATABASE_REPLICAS, все остальные запросы и любые записи идут в default.
+Пишущие представления, обёрнутые в pin_to_primary, на REPLICA_PIN_SECONDS
+привязывают браузер к default: пока реплики догоняют, пользователь видит
+собственные изменения. Срок привязки хранится в cookie, поэтому она
+работает в любом воркере и не стоит запроса к кэшу.
+"""
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+
+PIN_COOKIE = 'db_pin'
+
+_local = threading.local()
+
+
+def current_replica():
+    """Алиас реплики, с которой читает этот поток, или None."""
+    return getattr(_local, 'alias', None)
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_from_replica(view):
+    """Выполняет представление с чтением с реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or is_pinned(request):
+            return view(request, *args, **kwargs)
+        # Сессия и пользователь читаются из default: сразу после входа
+        # их может ещё не быть на реплике.
+        request.user.is_authenticated
+        _local.alias = random.choice(replicas)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.alias = None
+    return wrapper
+
+
+def pin_to_primary(view):
+    """Привязывает браузер к default после пишущего представления."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if settings.DATABASE_REPLICAS:
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds),
+                                max_age=seconds, httponly=True)
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,2 @@
+# Задачи core живут рядом со своим кодом, импорт их регистрирует.
+from .mail import flush_outbox  # noqa: F401
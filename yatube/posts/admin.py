@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Follow, Group, Post, Comment
+from .search import search_posts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,6 +16,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по полнотекстовому индексу вместо LIKE по таблице."""
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search_posts(search_term)), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
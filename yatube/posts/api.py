@@ -0,0 +1,101 @@
+"""JSON-версии лент и комментариев для мобильных клиентов.
+
+Страницы строятся теми же запросами и тем же кэшем страниц, что
+и HTML-ленты. Каждый ответ несёт сильный ETag от id, версий
+и выведенных полей записей, и повторный запрос с If-None-Match получает
+304 без тела.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .models import Group, Post, User
+from .paginators import keyset_window
+from .serializers import comment_row, post_row
+from .views import COMMENTS_WINDOW, get_page_context
+
+
+def make_etag(*parts):
+    return quote_etag(
+        hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+    )
+
+
+def conditional_json(request, etag, build):
+    """304 для совпавшего If-None-Match, иначе JSON из build()."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(build())
+    response['ETag'] = etag
+    return response
+
+
+def page_link(page, forward):
+    if forward:
+        if not page.has_next():
+            return None
+        if page.next_cursor:
+            return '?' + urlencode({'cursor': page.next_cursor})
+        return '?' + urlencode({'page': page.next_page_number()})
+    if not page.has_previous():
+        return None
+    if page.previous_cursor:
+        return '?' + urlencode({'cursor': page.previous_cursor})
+    return '?' + urlencode({'page': page.previous_page_number()})
+
+
+def post_tag(post):
+    """Всё, что post_row берёт из поста и связанных строк. Счётчик
+    комментариев и данные автора и группы меняются без смены версии
+    поста."""
+    group = post.group.slug if post.group_id else ''
+    return (f'{post.pk}:{post.version}:{post.comments_count}:'
+            f'{post.author.username}:{group}')
+
+
+def feed_response(request, post_list, feeds):
+    page = get_page_context(post_list, request, feeds,
+                            windowed=False)['page_obj']
+    etag = make_etag(page.number, page.has_next(), *map(post_tag, page))
+    return conditional_json(request, etag, lambda: {
+        'page': page.number,
+        'next': page_link(page, forward=True),
+        'previous': page_link(page, forward=False),
+        'results': [post_row(post) for post in page],
+    })
+
+
+def posts(request):
+    return feed_response(request, Post.objects.for_feed(), ['index'])
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.for_feed(),
+                         [f'group:{group.pk}'])
+
+
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.for_feed(),
+                         [f'profile:{author.pk}'])
+
+
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('comments_count'), pk=post_id)
+    comments, comments_next = keyset_window(
+        post.comments.select_related('author'), COMMENTS_WINDOW,
+        request.GET.get('after')
+    )
+    etag = make_etag(post.comments_count, comments_next,
+                     *(comment.pk for comment in comments))
+    return conditional_json(request, etag, lambda: {
+        'count': post.comments_count,
+        'next': ('?' + urlencode({'after': comments_next})
+                 if comments_next else None),
+        'results': [comment_row(comment) for comment in comments],
+    })
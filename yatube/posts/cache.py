@@ -0,0 +1,126 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import current_replica
+
+PAGE_TIMEOUT = 60 * 60 * 6
+
+
+def generation_key(feed):
+    return f'feed_gen:{feed}'
+
+
+def get_generations(feeds):
+    """Текущие поколения лент, отсутствующие заводятся заново.
+
+    Новое поколение берётся от текущего времени, а не с нуля, чтобы
+    после вытеснения счётчика из кэша старые ключи страниц не ожили.
+    """
+    keys = [generation_key(feed) for feed in feeds]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        found.update(cache.get_many(missing))
+    return [found[key] for key in keys]
+
+
+def bump_generations(*feeds):
+    """Сдвигает поколения лент, делая устаревшими их закэшированные
+    страницы."""
+    for feed in feeds:
+        key = generation_key(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def view_etag(request, feeds):
+    """ETag HTML-страницы по поколениям лент, из которых она собрана.
+
+    Страница зависит ещё от пользователя и его логина в шапке,
+    CSRF-токена в формах и параметров запроса, они тоже входят
+    в хэш. Базу не трогает.
+    Страница с отстающей реплики может не совпадать с поколением,
+    поэтому такой ETag живёт не дольше REPLICA_PIN_SECONDS.
+    """
+    parts = [
+        *map(str, get_generations(feeds)),
+        str(request.user.pk),
+        request.user.get_username(),
+        request.META.get('CSRF_COOKIE', ''),
+        request.GET.urlencode(),
+    ]
+    if current_replica():
+        parts.append(str(replica_window()))
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def replica_window():
+    return int(time.time() // max(settings.REPLICA_PIN_SECONDS, 1))
+
+
+def cache_timeout():
+    """Срок хранения страниц и счётчиков лент. Прочитанное с реплики
+    могло отстать от поколения и хранится только REPLICA_PIN_SECONDS."""
+    if current_replica():
+        return settings.REPLICA_PIN_SECONDS
+    return PAGE_TIMEOUT
+
+
+def feed_key(prefix, feeds):
+    """Ключ данных ленты. В него входит база, из которой они прочитаны:
+    отставшая реплика могла прочитать ленту без свежих записей уже
+    при новом поколении, и её список не должен достаться тем, кто
+    после своей записи читает с default."""
+    generations = '.'.join(map(str, get_generations(feeds)))
+    source = current_replica() or 'default'
+    return f'{prefix}:{feeds[0]}:{generations}:{source}'
+
+
+def page_cache_key(feeds, number, cursor):
+    return f'{feed_key("feed_page", feeds)}:{number or ""}:{cursor or ""}'
+
+
+def get_cached_count(queryset, feeds, limit):
+    """Число записей ленты, но не больше limit.
+
+    COUNT идёт по подзапросу с LIMIT, поэтому его цена не растёт
+    с длиной ленты. Результат хранится до смены поколений feeds.
+    """
+    key = feed_key('feed_count', feeds)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.order_by()[:limit].count()
+        cache.set(key, count, cache_timeout())
+    return count
+
+
+def get_cached_page(paginator, feeds, number=None, cursor=None):
+    """Страница ленты, id постов которой берутся из кэша.
+
+    В кэше лежит только список id страницы, сами посты дочитываются
+    по первичному ключу, а карточки рендерятся из своих фрагментов,
+    поэтому в кэш не попадает ничего, зависящее от пользователя.
+    Ключ включает поколения лент feeds, поэтому любое изменение
+    постов или подписок сразу делает его неактуальным.
+    """
+    key = page_cache_key(feeds, paginator.page_number(number), cursor)
+    state = cache.get(key)
+    if state is None:
+        page = paginator.get_page(number, cursor)
+        cache.set(
+            key,
+            (page.number, [post.pk for post in page], page.has_next()),
+            cache_timeout()
+        )
+        return page
+    number, ids, has_next = state
+    posts = paginator.object_list.in_bulk(ids)
+    rows = [posts[pk] for pk in ids if pk in posts]
+    return paginator.build_page(rows, number, has_next)
@@ -0,0 +1,90 @@
+"""Карточки постов для лент.
+
+Разметка карточки одна на все ленты: posts/includes/post_card.html.
+Готовый HTML карточки хранится в кэше по версии поста, а карточки
+страницы читаются одним get_many, поэтому шаблон рендерится только
+для новых и изменённых постов. Ключ включает имя автора и slug
+группы: они меняются без правки самого поста.
+
+Ссылки карточки строятся не через reverse на каждый пост: маршрут
+разворачивается один раз с образцом аргумента, а потом в готовый
+шаблон адреса подставляется значение.
+"""
+import hashlib
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.urls import get_script_prefix, reverse
+from django.utils.safestring import mark_safe
+
+from .cache import PAGE_TIMEOUT
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+URL_SAMPLES = {
+    'posts:profile': 'url-sample',
+    'posts:group_list': 'url-sample',
+    'posts:post_detail': 987654321,
+}
+# Символы, которые reverse оставляет в аргументах без кодирования.
+URL_SAFE = "!$&'()*+,;=/~:@"
+
+
+@lru_cache(maxsize=None)
+def url_parts(name, prefix):
+    """Адрес маршрута name, разрезанный по месту аргумента.
+
+    prefix участвует только в ключе lru_cache: под другим
+    SCRIPT_NAME адреса разворачиваются заново.
+    """
+    sample = URL_SAMPLES[name]
+    parts = reverse(name, args=[sample]).split(str(sample))
+    return tuple(parts) if len(parts) == 2 else None
+
+
+def card_url(name, value):
+    parts = url_parts(name, get_script_prefix())
+    if parts is None:
+        return reverse(name, args=[value])
+    return quote(str(value), safe=URL_SAFE).join(parts)
+
+
+def card_urls(post):
+    urls = {
+        'profile': card_url('posts:profile', post.author.username),
+        'detail': card_url('posts:post_detail', post.pk),
+    }
+    if post.group_id:
+        urls['group'] = card_url('posts:group_list', post.group.slug)
+    return urls
+
+
+def card_key(post):
+    author = post.author
+    owners = '|'.join([
+        author.username, author.get_full_name(),
+        post.group.slug if post.group_id else '',
+    ])
+    digest = hashlib.md5(owners.encode()).hexdigest()
+    return f'post_card:{post.pk}:{post.version}:{digest}'
+
+
+def render_cards(posts):
+    """HTML карточек постов в порядке posts.
+
+    Посты должны прийти из for_feed() и пройти attach_thumbnails.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    found = cache.get_many(keys)
+    missing = {}
+    if len(found) < len(keys):
+        template = get_template(CARD_TEMPLATE)
+        for key, post in zip(keys, posts):
+            if key not in found:
+                missing[key] = template.render(
+                    {'post': post, 'urls': card_urls(post)})
+        cache.set_many(missing, PAGE_TIMEOUT)
+        found.update(missing)
+    return [mark_safe(found[key]) for key in keys]
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.management.commands.import_posts import detect_format
+from posts.transfer import FORMATS, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в JSON Lines или CSV потоком'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки или - для stdout')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию по расширению файла')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз'
+        )
+        parser.add_argument('--images-dir',
+                            help='Куда скопировать файлы картинок')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+        rows = export_rows(chunk_size=options['chunk_size'],
+                           images_dir=options['images_dir'])
+        if path == '-':
+            total = write_rows(self.stdout, rows, fmt)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as stream:
+                total = write_rows(stream, rows, fmt)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено постов: {total}'
+        ))
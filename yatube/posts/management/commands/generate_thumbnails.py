@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Ставит в очередь задач создание миниатюр для уже '
+            'загруженных картинок постов')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').values_list('pk', 'image')
+        total = 0
+        for total, (pk, image) in enumerate(posts.iterator(), 1):
+            generate_thumbnails.delay(pk, image)
+        self.stdout.write(self.style.SUCCESS(
+            f'Поставлено в очередь картинок: {total}'
+        ))
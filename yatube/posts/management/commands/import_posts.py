@@ -0,0 +1,59 @@
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import FORMATS, PostImporter, read_rows
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    if path.endswith('.csv'):
+        return 'csv'
+    return 'jsonl'
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты из JSON Lines или CSV пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл постов или - для stdin')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию по расширению файла')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов вставлять одним bulk_create'
+        )
+        parser.add_argument('--images-dir',
+                            help='Каталог, от которого считаются пути '
+                                 'картинок из поля image')
+        parser.add_argument('--create-authors', action='store_true',
+                            help='Заводить пользователей для неизвестных '
+                                 'авторов')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+        try:
+            importer = PostImporter(
+                batch_size=options['batch_size'],
+                images_dir=options['images_dir'],
+                create_authors=options['create_authors'],
+            )
+        except ImproperlyConfigured as error:
+            raise CommandError(error)
+        try:
+            if path == '-':
+                importer.run(read_rows(sys.stdin, fmt))
+            else:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    importer.run(read_rows(stream, fmt))
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        for number, message in sorted(importer.errors):
+            self.stderr.write(f'Строка {number}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {importer.imported}, '
+            f'пропущено строк: {len(importer.errors)}'
+        ))
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 
 
@@ -14,6 +16,22 @@ class Group(models.Model):
         return self.title
 
 
+class FeedQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'text', 'pub_date', 'updated', 'image', 'image_variants',
+        'comments_count', 'author', 'group',
+        'author__username', 'author__first_name', 'author__last_name',
+        'group__slug',
+    )
+
+    def for_feed(self):
+        """Посты для карточек ленты: автор и группа одним запросом,
+        только поля, которые выводят шаблоны."""
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS
+        )
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст',
                             help_text='Введите текст поста')
@@ -38,10 +56,32 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    image_variants = models.CharField(max_length=255, blank=True,
+                                      editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = FeedQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.text
 
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+        ]
+
+    @property
+    def version(self):
+        """Метка версии поста для ключей кэша."""
+        return self.updated.timestamp()
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -60,6 +100,12 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -78,3 +124,124 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_user_author')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_user_post')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_date_post_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+def _count_subquery(model, field):
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by()
+    return Coalesce(Subquery(
+        rows.values(field).annotate(total=Count('pk')).values('total'),
+        output_field=models.IntegerField()
+    ), 0)
+
+
+class AuthorStatsManager(models.Manager):
+    COUNTERS = ('posts_count', 'followers_count', 'following_count')
+
+    @transaction.atomic
+    def change(self, author_id, **deltas):
+        """Атомарно сдвигает счётчики автора на deltas.
+
+        Если строки ещё нет, при увеличении она пересчитывается целиком,
+        а уменьшение пропускается: автора могут удалять каскадом.
+        """
+        updated = self.filter(author_id=author_id).update(**{
+            name: F(name) + delta for name, delta in deltas.items()
+        })
+        if not updated and any(delta > 0 for delta in deltas.values()):
+            self.rebuild(User.objects.filter(pk=author_id))
+
+    def for_author(self, author):
+        try:
+            return author.stats
+        except AuthorStats.DoesNotExist:
+            self.rebuild(User.objects.filter(pk=author.pk))
+            return self.get(author=author)
+
+    def rebuild(self, users=None, batch_size=1000):
+        """Пересчитывает счётчики и возвращает число исправленных строк."""
+        if users is None:
+            users = User.objects.all()
+        rows = users.order_by('pk').annotate(
+            posts_total=_count_subquery(Post, 'author'),
+            followers_total=_count_subquery(Follow, 'author'),
+            following_total=_count_subquery(Follow, 'user'),
+        ).values_list('pk', 'posts_total', 'followers_total',
+                      'following_total')
+        fixed = 0
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                fixed += self._reconcile(batch)
+                batch = []
+        if batch:
+            fixed += self._reconcile(batch)
+        return fixed
+
+    def _reconcile(self, rows):
+        with transaction.atomic():
+            stored = self.select_for_update().in_bulk([row[0] for row in rows])
+            missing, changed = [], []
+            for pk, *counters in rows:
+                fresh = AuthorStats(author_id=pk, **dict(
+                    zip(self.COUNTERS, counters)))
+                current = stored.get(pk)
+                if current is None:
+                    missing.append(fresh)
+                elif any(getattr(current, name) != getattr(fresh, name)
+                         for name in self.COUNTERS):
+                    changed.append(fresh)
+            self.bulk_create(missing, ignore_conflicts=True)
+            self.bulk_update(changed, self.COUNTERS)
+        return len(missing) + len(changed)
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики для страниц авторов."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    objects = AuthorStatsManager()
@@ -0,0 +1,234 @@
+import base64
+import binascii
+import heapq
+import itertools
+import math
+
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(number, direction, pub_date, pk):
+    raw = f'{number}|{direction}|{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает курсор, для испорченного значения возвращает None."""
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        number, direction, pub_date, pk = raw.split('|')
+        number, pk = int(number), int(pk)
+        pub_date = parse_datetime(pub_date)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if pub_date is None or direction not in (FORWARD, BACKWARD):
+        return None
+    return max(number, 1), direction, pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу (pub_date, id) или другой паре keys.
+
+    Первые offset_pages страниц доступны по ?page=N, дальше лента
+    листается курсорами ?cursor=..., каждый из которых разворачивается
+    в запрос по индексу без OFFSET. COUNT(*) не выполняется: о наличии
+    следующей страницы узнаём, запросив на одну запись больше.
+    """
+
+    date_field = 'pub_date'
+    key_field = 'pk'
+
+    def __init__(self, object_list, per_page, offset_pages=5, keys=None,
+                 **kwargs):
+        if keys is not None:
+            self.date_field, self.key_field = keys
+        object_list = object_list.order_by(
+            f'-{self.date_field}', f'-{self.key_field}'
+        )
+        super().__init__(object_list, per_page, **kwargs)
+        self.offset_pages = offset_pages
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            decoded = decode_cursor(cursor)
+            if decoded is not None:
+                return self.cursor_page(*decoded)
+        return self.offset_page(self.page_number(number))
+
+    def page_number(self, number):
+        """Номер страницы из ?page=N: испорченный ведёт на первую,
+        слишком большой — на последнюю доступную по номеру."""
+        try:
+            return self.validate_number(number)
+        except EmptyPage:
+            return 1
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            return 1
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return min(number, self.offset_pages)
+
+    def fetch(self, limit, direction=FORWARD, after=None, offset=0):
+        """Не больше limit записей ленты в порядке direction после
+        ключа after, пропустив первые offset.
+
+        Все чтения страниц идут через этот метод, подклассы
+        переопределяют его, чтобы собирать ленту из нескольких
+        источников.
+        """
+        return self.read(self.object_list, direction, after, offset, limit)
+
+    def read(self, queryset, direction, after, offset, limit):
+        if direction == BACKWARD:
+            queryset = queryset.reverse()
+        if after is not None:
+            queryset = queryset.filter(self.after(direction, *after))
+        return list(queryset[offset:offset + limit])
+
+    def after(self, direction, pub_date, pk):
+        """Условие на записи, идущие в направлении direction за ключом."""
+        op = 'lt' if direction == FORWARD else 'gt'
+        return (
+            Q(**{f'{self.date_field}__{op}': pub_date})
+            | Q(**{self.date_field: pub_date, f'{self.key_field}__{op}': pk})
+        )
+
+    def offset_page(self, number):
+        bottom = (number - 1) * self.per_page
+        rows = self.fetch(self.per_page + 1, offset=bottom)
+        if not rows and number > 1:
+            # Ссылка ведёт дальше конца ленты: как и Paginator.get_page,
+            # отдаём последнюю страницу. Номер не больше offset_pages,
+            # поэтому все предыдущие записи читаются одним запросом
+            # вместо COUNT.
+            rows = self.fetch(bottom)
+            number = max(math.ceil(len(rows) / self.per_page), 1)
+            rows = rows[(number - 1) * self.per_page:]
+        has_next = len(rows) > self.per_page
+        return self.build_page(rows[:self.per_page], number, has_next)
+
+    def cursor_page(self, number, direction, pub_date, pk):
+        rows = self.fetch(self.per_page + 1, direction, (pub_date, pk))
+        if direction == FORWARD:
+            return self.build_page(
+                rows[:self.per_page], number, len(rows) > self.per_page
+            )
+        if not rows:
+            return self.offset_page(1)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        if not has_previous:
+            number = 1
+        elif number == 1:
+            number = 2
+        return self.build_page(rows, number, has_next=True)
+
+    def build_page(self, rows, number, has_next):
+        # Точное число страниц неизвестно, поэтому Page видит ровно
+        # столько, сколько нужно для has_next/has_previous.
+        self.num_pages = number + 1 if has_next else number
+        self.count = (number - 1) * self.per_page + len(rows) + has_next
+        page = Page(rows, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if has_next and number >= self.offset_pages and rows:
+            last = rows[-1]
+            page.next_cursor = encode_cursor(
+                number + 1, FORWARD, getattr(last, self.date_field),
+                getattr(last, self.key_field)
+            )
+        if number > self.offset_pages + 1 and rows:
+            first = rows[0]
+            page.previous_cursor = encode_cursor(
+                number - 1, BACKWARD, getattr(first, self.date_field),
+                getattr(first, self.key_field)
+            )
+        return page
+
+
+class MergedPaginator(CursorPaginator):
+    """CursorPaginator над лентой, собранной из нескольких источников.
+
+    object_list описывает всю ленту и нужен только для выборки постов
+    по id и подсчёта, а страницы читаются из sources: каждый источник
+    упорядочен по своему индексу, из него берётся не больше записей,
+    чем нужно странице, и эти куски сливаются по ключу. Источники не
+    должны пересекаться.
+    """
+
+    def __init__(self, object_list, sources, per_page, offset_pages=5,
+                 keys=None, **kwargs):
+        super().__init__(object_list, per_page, offset_pages, keys, **kwargs)
+        self.sources = [
+            source.order_by(f'-{self.date_field}', f'-{self.key_field}')
+            for source in sources
+        ]
+
+    def fetch(self, limit, direction=FORWARD, after=None, offset=0):
+        def key(row):
+            return getattr(row, self.date_field), getattr(row, self.key_field)
+
+        rows = heapq.merge(
+            *(self.read(source, direction, after, 0, offset + limit)
+              for source in self.sources),
+            key=key, reverse=direction == FORWARD
+        )
+        return list(itertools.islice(rows, offset, offset + limit))
+
+
+def page_window(page, count=None, radius=2):
+    """Номера страниц вокруг текущей для ссылок ?page=N.
+
+    У CursorPaginator по номеру доступны только первые offset_pages
+    страниц, дальше ссылок нет. Последняя страница берётся из count,
+    а без него известна только следующая.
+    """
+    paginator = page.paginator
+    offset_pages = getattr(paginator, 'offset_pages', None)
+    if offset_pages is None:
+        last = paginator.num_pages
+    elif page.number > offset_pages:
+        return range(0)
+    else:
+        last = page.number + page.has_next()
+        if count is not None:
+            last = max(last, math.ceil(count / paginator.per_page))
+        last = min(last, offset_pages)
+    return range(max(page.number - radius, 1),
+                 max(min(page.number + radius, last), page.number) + 1)
+
+
+def keyset_window(queryset, size, after=None, keys=('created', 'pk')):
+    """Следующие size записей по возрастанию keys после курсора after.
+
+    Возвращает записи окна и курсор следующего окна, None — если
+    записей больше нет. Испорченный курсор читается как начало списка.
+    """
+    date_field, key_field = keys
+    queryset = queryset.order_by(date_field, key_field)
+    decoded = decode_cursor(after) if after else None
+    if decoded is not None:
+        _, _, date, pk = decoded
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__gt': date})
+            | Q(**{date_field: date, f'{key_field}__gt': pk})
+        )
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    last = rows[size - 1]
+    return rows[:size], encode_cursor(
+        1, FORWARD, getattr(last, date_field), getattr(last, key_field)
+    )
@@ -0,0 +1,112 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+class SearchBackend:
+    """Интерфейс поискового индекса постов."""
+
+    def update(self, post):
+        """Добавляет или обновляет пост в индексе."""
+
+    def update_many(self, posts):
+        """Добавляет в индекс пачку постов."""
+        for post in posts:
+            self.update(post)
+
+    def remove(self, post_id):
+        """Убирает пост из индекса."""
+
+    def rebuild(self):
+        """Перестраивает индекс по всем постам."""
+
+    def search(self, query, limit):
+        """id найденных постов, самые релевантные первыми."""
+        raise NotImplementedError
+
+
+class SubstringBackend(SearchBackend):
+    """Поиск подстрокой без индекса для баз без полнотекстового поиска."""
+
+    def search(self, query, limit):
+        return list(
+            Post.objects.filter(text__icontains=query)
+            .values_list('pk', flat=True)[:limit]
+        )
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Инвертированный индекс на виртуальной таблице SQLite FTS5."""
+
+    table = 'posts_post_fts'
+
+    def update(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text]
+            )
+
+    def update_many(self, posts):
+        rows = [(post.pk, post.text) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(pk,) for pk, _ in rows]
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, text) VALUES (%s, %s)',
+                rows
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}'
+            )
+
+    def match_expression(self, query):
+        # Каждое слово ищется как префикс, спецсимволы FTS5 не доходят
+        # до MATCH и не ломают запрос.
+        return ' '.join(
+            f'"{token}"*' for token in TOKEN_RE.findall(query)
+        )
+
+    def search(self, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} '
+                f'MATCH %s ORDER BY rank LIMIT %s',
+                [expression, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def get_backend():
+    return import_string(settings.POST_SEARCH_BACKEND)()
+
+
+def search_posts(query, limit=None):
+    if limit is None:
+        limit = settings.POST_SEARCH_LIMIT
+    return get_backend().search(query, limit)
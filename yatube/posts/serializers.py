@@ -0,0 +1,22 @@
+"""Компактные словари постов и комментариев для JSON-ответов."""
+
+
+def post_row(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': getattr(post, 'thumbnail_url', None),
+        'comments': post.comments_count,
+    }
+
+
+def comment_row(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+    }
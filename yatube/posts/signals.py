@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import tasks, timeline
+from .search import get_backend as get_search_backend
+from .cache import bump_generations
+from .models import (AuthorStats, Comment, Follow, Group, Post,
+                     TimelineEntry)
+
+# Поля, которые выводят страницы: их правка должна менять ETag.
+USER_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_FIELDS = ('title', 'slug', 'description')
+
+
+def remember_fields(sender, instance, fields, update_fields):
+    """Сохраняет в instance._old_fields значения fields до записи.
+
+    Сохранения, не трогающие fields (например, last_login при входе),
+    лишнего запроса не делают.
+    """
+    instance._old_fields = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return
+    instance._old_fields = sender._default_manager.filter(
+        pk=instance.pk).values_list(*fields).first()
+
+
+def fields_changed(instance, fields):
+    old = getattr(instance, '_old_fields', None)
+    return old is not None and old != tuple(
+        getattr(instance, field) for field in fields)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    remember_fields(sender, instance, USER_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(author=instance)
+    elif fields_changed(instance, USER_FIELDS):
+        # Имя автора есть в карточках его постов и на странице поста,
+        # логин — ещё и в комментариях к чужим постам.
+        feeds = {'index', f'profile:{instance.pk}'}
+        feeds.update(
+            f'group:{group_id}' for group_id in Post.objects.filter(
+                author=instance, group__isnull=False
+            ).order_by().values_list('group_id', flat=True).distinct()
+        )
+        feeds.update(
+            f'post:{post_id}' for post_id in Comment.objects.filter(
+                author=instance
+            ).order_by().values_list('post_id', flat=True).distinct()
+        )
+        bump_generations(*feeds)
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, update_fields=None, **kwargs):
+    remember_fields(sender, instance, GROUP_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not fields_changed(instance, GROUP_FIELDS):
+        return
+    feeds = {f'group:{instance.pk}'}
+    if instance._old_fields[:2] != (instance.title, instance.slug):
+        # Ссылка на группу есть в карточках лент, название — на
+        # странице поста, ETag которой зависит от профиля автора.
+        # order_by() убирает поля Meta.ordering из DISTINCT.
+        feeds.add('index')
+        feeds.update(
+            f'profile:{author_id}' for author_id in
+            instance.posts.order_by().values_list(
+                'author_id', flat=True).distinct()
+        )
+    bump_generations(*feeds)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    instance._old_group_id = None
+    if instance.pk is not None:
+        instance._old_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    feeds = ['index', f'profile:{instance.author_id}', f'post:{instance.pk}']
+    for group_id in {instance.group_id, instance._old_group_id} - {None}:
+        feeds.append(f'group:{group_id}')
+    if created:
+        AuthorStats.objects.change(instance.author_id, posts_count=1)
+        tasks.fan_out_post.delay(instance.pk)
+    tasks.index_post.delay(instance.pk)
+    bump_generations(*feeds)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    instance._timeline_users = list(TimelineEntry.objects.filter(
+        post=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    AuthorStats.objects.change(instance.author_id, posts_count=-1)
+    feeds = ['index', f'profile:{instance.author_id}', f'post:{instance.pk}']
+    if instance.group_id is not None:
+        feeds.append(f'group:{instance.group_id}')
+    feeds.extend(f'follow:{user_id}' for user_id in instance._timeline_users)
+    get_search_backend().remove(instance.pk)
+    bump_generations(*feeds)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1
+        )
+    bump_generations(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1
+    )
+    bump_generations(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.change(instance.author_id, followers_count=1)
+        AuthorStats.objects.change(instance.user_id, following_count=1)
+        if timeline.add_author(instance.user_id, instance.author_id):
+            tasks.backfill_timeline.delay(instance.author_id,
+                                          [instance.user_id])
+        bump_generations(f'follow:{instance.user_id}',
+                         f'stats:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    AuthorStats.objects.change(instance.author_id, followers_count=-1)
+    AuthorStats.objects.change(instance.user_id, following_count=-1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    if timeline.left_celebrities(instance.author_id):
+        tasks.backfill_timeline.delay(instance.author_id)
+    bump_generations(f'follow:{instance.user_id}',
+                     f'stats:{instance.author_id}')
@@ -0,0 +1,39 @@
+"""Фоновые задачи постов: то, без чего ответ на запись может уйти
+раньше, чем задача выполнится."""
+from tasks.queue import task
+
+from . import timeline
+from .cache import bump_generations
+from .models import Post
+from .search import get_backend as get_search_backend
+# Задача миниатюр живёт рядом с их генерацией, импорт её регистрирует.
+from .thumbnails import generate_thumbnails  # noqa: F401
+
+
+@task
+def fan_out_post(post_id):
+    """Раскладывает новый пост по лентам подписчиков."""
+    post = Post.objects.filter(pk=post_id).only(
+        'author_id', 'pub_date').first()
+    if post is None:
+        return
+    followers = timeline.fan_out_post(post)
+    bump_generations(*(f'follow:{user_id}' for user_id in followers))
+
+
+@task
+def backfill_timeline(author_id, user_ids=None):
+    """Дораскладывает посты автора по лентам подписчиков: старые посты
+    после подписки или все после выхода автора из популярных."""
+    followers = timeline.backfill(author_id, user_ids)
+    bump_generations(*(f'follow:{user_id}' for user_id in followers))
+
+
+@task
+def index_post(post_id):
+    """Обновляет пост в поисковом индексе."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        get_search_backend().remove(post_id)
+    else:
+        get_search_backend().update(post)
@@ -0,0 +1,12 @@
+from django import template
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.filter
+def post_cards(posts):
+    """HTML карточек постов страницы, прочитанный из кэша одним
+    запросом."""
+    return render_cards(posts)
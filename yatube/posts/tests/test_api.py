@@ -0,0 +1,123 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+
+User = get_user_model()
+TEST_OF_POST = 13
+
+
+class FeedApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        for i in range(TEST_OF_POST):
+            Post.objects.create(text=f'Текст{i}', author=self.user,
+                                group=self.group)
+        self.post = Post.objects.latest('pub_date')
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+
+    def test_feeds(self):
+        """Ленты отдают компактные строки постов постранично"""
+        urls = (
+            reverse('posts:api_posts'),
+            reverse('posts:api_group', args=['group']),
+            reverse('posts:api_profile', args=['author']),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['next'], '?page=2')
+                self.assertIsNone(data['previous'])
+                row = data['results'][0]
+                self.assertEqual(row['id'], self.post.pk)
+                self.assertEqual(row['author'], 'author')
+                self.assertEqual(row['group'], 'group')
+                self.assertEqual(row['comments'], 1)
+                data = self.client.get(url + data['next']).json()
+                self.assertEqual(len(data['results']), 3)
+                self.assertIsNone(data['next'])
+
+    def test_missing_feed(self):
+        """Несуществующие группа, автор и пост дают 404"""
+        for url in (reverse('posts:api_group', args=['missing']),
+                    reverse('posts:api_profile', args=['missing']),
+                    reverse('posts:api_comments', args=[0])):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_not_modified(self):
+        """Неизменившаяся лента отвечает 304, изменение меняет ETag"""
+        url = reverse('posts:api_posts')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_tracks_related_fields(self):
+        """Новый комментарий, смена имени автора и slug группы меняют
+        ETag, хотя версия поста остаётся прежней"""
+        url = reverse('posts:api_posts')
+        changes = (
+            lambda: Comment.objects.create(post=self.post, author=self.user,
+                                           text='Ещё'),
+            lambda: User.objects.filter(pk=self.user.pk).update(
+                username='renamed'),
+            lambda: Group.objects.filter(pk=self.group.pk).update(
+                slug='renamed'),
+        )
+        for change in changes:
+            etag = self.client.get(url)['ETag']
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    def test_rename_bumps_each_feed_once(self):
+        """Переименование группы и автора сдвигает поколение каждой
+        ленты один раз, сколько бы постов в ней ни было"""
+        Comment.objects.create(post=self.post, author=self.user, text='Ещё')
+        cases = (
+            (self.group, 'title',
+             [f'group:{self.group.pk}', 'index',
+              f'profile:{self.user.pk}']),
+            (self.user, 'username',
+             [f'group:{self.group.pk}', 'index',
+              f'post:{self.post.pk}', f'profile:{self.user.pk}']),
+        )
+        for instance, field, expected in cases:
+            with self.subTest(field=field), mock.patch(
+                    'posts.signals.bump_generations') as bump:
+                setattr(instance, field, 'renamed')
+                instance.save()
+                self.assertEqual(len(bump.call_args_list), 1)
+                self.assertEqual(sorted(bump.call_args[0]), expected)
+
+    def test_comments(self):
+        """Комментарии отдаются окном с ETag от их состава"""
+        url = reverse('posts:api_comments', args=[self.post.pk])
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+        self.assertIsNone(data['next'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Ещё')
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,40 @@
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase
+
+from posts.cache import bump_generations, get_generations
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.shared = caches['shared']
+
+    def test_local_copy(self):
+        """Прочитанное значение отдаётся из памяти процесса"""
+        cache.set('page', 'старое')
+        self.shared.set('page', 'новое')
+        self.assertEqual(cache.get('page'), 'старое')
+        self.assertEqual(cache.get_many(['page']), {'page': 'старое'})
+        cache.local.clear()
+        self.assertEqual(cache.get('page'), 'новое')
+
+    def test_shared_prefixes_bypass_local(self):
+        """Поколения лент всегда читаются из общего кэша"""
+        generation = get_generations(['index'])[0]
+        # Другой воркер сдвигает поколение в общем кэше.
+        self.shared.incr('feed_gen:index')
+        self.assertEqual(get_generations(['index']), [generation + 1])
+        bump_generations('index')
+        self.assertEqual(get_generations(['index']), [generation + 2])
+
+    def test_writes_reach_shared(self):
+        """Запись, удаление и incr сразу видны общему кэшу"""
+        cache.set('counter', 1)
+        self.assertEqual(self.shared.get('counter'), 1)
+        self.assertEqual(cache.incr('counter'), 2)
+        self.assertEqual(cache.get('counter'), 2)
+        cache.delete('counter')
+        self.assertIsNone(self.shared.get('counter'))
+        self.assertIsNone(cache.get('counter'))
+        self.assertTrue(cache.add('counter', 5))
+        self.assertFalse(cache.add('counter', 6))
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Профиль SQLite')
+class SQLiteConcurrencyTest(SimpleTestCase):
+    """Читатели не ждут писателя в базе SQLite в режиме WAL"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.connections = ConnectionHandler({'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, 'concurrency.sqlite3'),
+        }})
+        self.addCleanup(self.connections.close_all)
+        with self.cursor() as cursor:
+            cursor.execute('CREATE TABLE post (text TEXT)')
+            cursor.execute("INSERT INTO post VALUES ('первый')")
+
+    def cursor(self):
+        return self.connections['default'].cursor()
+
+    def in_thread(self, function):
+        """Выполняет function в отдельном потоке со своим соединением."""
+        result = {}
+
+        def run():
+            try:
+                result['value'] = function()
+            except Exception as error:
+                result['error'] = error
+            finally:
+                self.connections['default'].close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+    def count_posts(self):
+        with self.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM post')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Новое соединение получает WAL и synchronous=NORMAL"""
+        with self.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_reader_not_blocked_by_writer(self):
+        """Чтение идёт, пока другой поток держит транзакцию записи"""
+        with self.cursor() as cursor:
+            cursor.execute('BEGIN EXCLUSIVE')
+            cursor.execute("INSERT INTO post VALUES ('второй')")
+
+            def timed_count():
+                started = time.monotonic()
+                return self.count_posts(), time.monotonic() - started
+
+            count, elapsed = self.in_thread(timed_count)
+            self.assertEqual(count, 1)
+            self.assertLess(elapsed, 1)
+            cursor.execute('COMMIT')
+        self.assertEqual(self.in_thread(self.count_posts), 2)
+
+    def test_writer_waits_for_writer(self):
+        """Второй писатель дожидается блокировки, а не падает"""
+        with self.cursor() as cursor:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute("INSERT INTO post VALUES ('второй')")
+            timer = threading.Timer(0.2, cursor.execute, ['COMMIT'])
+            timer.start()
+
+            def write():
+                with self.cursor() as other:
+                    other.execute("INSERT INTO post VALUES ('третий')")
+
+            self.in_thread(write)
+            timer.join()
+        self.assertEqual(self.count_posts(), 3)
@@ -141,6 +141,7 @@ class PostCacheTestCase(TestCase):
         cls.guest_client.force_login(cls.user)
 
     def test_cache(self):
+        """Изменения видны сразу, без изменений страница берётся из кэша"""
         before_create_post = self.guest_client.get(
             reverse('posts:main_page')).content
         Post.objects.create(
@@ -150,7 +151,12 @@ class PostCacheTestCase(TestCase):
         )
         after_create_post = self.guest_client.get(
             reverse('posts:main_page')).content
-        self.assertEqual(before_create_post, after_create_post)
+        self.assertNotEqual(before_create_post, after_create_post)
+        Post.objects.bulk_create([
+            Post(text='bulk text', author=self.author, group=self.group)
+        ])
+        cached = self.guest_client.get(reverse('posts:main_page')).content
+        self.assertEqual(cached, after_create_post)
         cache.clear()
         after_clear = self.guest_client.get(reverse('posts:main_page')).content
-        self.assertNotEqual(after_clear, before_create_post)
+        self.assertNotEqual(after_clear, after_create_post)
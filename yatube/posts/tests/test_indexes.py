@@ -0,0 +1,91 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import BACKWARD, FORWARD, CursorPaginator
+from posts.timeline import FEED_KEYS, follow_feed, follow_sources
+
+
+User = get_user_model()
+TABLE_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedIndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Name')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(text='Текст', author=cls.user,
+                                       group=cls.group)
+
+    def get_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndexes(self, queryset):
+        plan = self.get_plan(queryset)
+        for detail in plan:
+            self.assertIsNone(TABLE_SCAN.match(detail), plan)
+            self.assertNotIn('TEMP B-TREE', detail, plan)
+
+    def feed_page(self, posts):
+        return CursorPaginator(posts, 10).object_list[:11]
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент читают посты по индексам без сортировки"""
+        querysets = {
+            'index': Post.objects.all(),
+            'group': self.group.posts.all(),
+            'profile': self.user.posts.all(),
+        }
+        for name, posts in querysets.items():
+            with self.subTest(feed=name):
+                self.assertUsesIndexes(self.feed_page(posts))
+
+    def test_cursor_page_uses_index(self):
+        """Страница по курсору ищет по индексу, а не сканирует таблицу"""
+        paginator = CursorPaginator(self.group.posts.all(), 10)
+        queryset = paginator.object_list.filter(
+            Q(pub_date__lt=self.post.pub_date)
+            | Q(pub_date=self.post.pub_date, pk__lt=self.post.pk))[:11]
+        self.assertUsesIndexes(queryset)
+
+    def test_follow_queries_use_indexes(self):
+        """Лента подписок и выборка подписчиков идут по индексам"""
+        self.assertUsesIndexes(CursorPaginator(
+            follow_feed(self.user, []), 10, keys=FEED_KEYS).object_list[:11])
+        self.assertUsesIndexes(
+            Follow.objects.filter(author=self.user).values('user_id'))
+
+    def test_celebrity_follow_queries_use_indexes(self):
+        """С популярными авторами каждый источник ленты подписок
+        читается по своему индексу, и не больше страницы"""
+        celebrity = User.objects.create_user(username='celebrity')
+        key = (self.post.pub_date, self.post.pk)
+        for source in follow_sources(self.user, [celebrity.pk, self.user.pk]):
+            paginator = CursorPaginator(source, 10, keys=FEED_KEYS)
+            queryset = paginator.object_list
+            cases = {
+                'offset': queryset[:11],
+                'forward': queryset.filter(
+                    paginator.after(FORWARD, *key))[:11],
+                'backward': queryset.reverse().filter(
+                    paginator.after(BACKWARD, *key))[:11],
+            }
+            for name, page in cases.items():
+                with self.subTest(source=str(source.query), page=name):
+                    self.assertUsesIndexes(page)
+
+    def test_comments_use_index(self):
+        """Комментарии поста выбираются по индексу (post, created)"""
+        self.assertUsesIndexes(
+            Comment.objects.filter(post=self.post).order_by('created'))
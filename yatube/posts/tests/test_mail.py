@@ -0,0 +1,133 @@
+import socket
+import socketserver
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.models import OutboxMessage
+from tasks.models import Job
+from tasks.queue import Worker
+
+User = get_user_model()
+BURST = 5
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-диалог: принимает любые письма и копит их."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost')
+        data = None
+        for line in self.rfile:
+            if data is not None:
+                if line == b'.\r\n':
+                    self.server.messages.append(b''.join(data))
+                    data = None
+                    self.reply('250 OK')
+                else:
+                    data.append(line[1:] if line.startswith(b'..')
+                                else line)
+                continue
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command == b'DATA':
+                data = []
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class QueuedEmailTest(TransactionTestCase):
+    """Письма копятся в outbox и уходят пачкой через одно соединение"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = SMTPServer()
+        threading.Thread(target=cls.server.serve_forever,
+                         daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.connections = 0
+        self.server.messages = []
+        settings = override_settings(
+            EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+            EMAIL_DELIVERY_BACKEND=(
+                'django.core.mail.backends.smtp.EmailBackend'),
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.server_address[1],
+            TASKS_EAGER=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_reset_burst(self):
+        """Сброс пароля не ждёт сервер, письма уходят одной рассылкой"""
+        for number in range(BURST):
+            User.objects.create_user(
+                username=f'user{number}', password='secret',
+                email=f'user{number}@example.com')
+            response = self.client.post(reverse('users:password_reset'),
+                                        {'email': f'user{number}@example.com'})
+            self.assertRedirects(response,
+                                 reverse('users:password_reset_done'))
+        self.assertEqual(self.server.connections, 0)
+        self.assertEqual(OutboxMessage.objects.count(), BURST)
+        self.assertEqual(Job.objects.count(), 1)
+        Worker().run(burst=True)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.server.messages), BURST)
+        self.assertIn(b'To: user0@example.com', self.server.messages[0])
+        self.assertIn(b'/auth/reset/', self.server.messages[0])
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_server_down(self):
+        """Недоставленные письма ждут следующей попытки задачи"""
+        with self.settings(EMAIL_PORT=free_port()):
+            send_mail('Тема', 'Текст', 'from@example.com',
+                      ['to@example.com'])
+            with self.assertLogs('tasks.queue', 'ERROR'):
+                Worker().run_once()
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        message = OutboxMessage.objects.get()
+        self.assertIsNone(message.claimed_until)
+        Job.objects.update(run_at=job.created)
+        Worker().run(burst=True)
+        self.assertEqual(len(self.server.messages), 1)
+        self.assertIn(b'Subject: =?utf-8?b?', self.server.messages[0])
+        self.assertFalse(OutboxMessage.objects.exists())
@@ -0,0 +1,144 @@
+import re
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import (disable_template_profiling,
+                          enable_template_profiling, registry,
+                          template_profile)
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+METRICS_TOKEN = 'secret-token'
+
+
+@override_settings(METRICS_TOKEN=METRICS_TOKEN)
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create_user(username='Name')
+        self.post = Post.objects.create(text='Текст', author=self.user)
+
+    def get_metrics(self, **extra):
+        return self.client.get(reverse('metrics'),
+                               HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}',
+                               **extra)
+
+    def cache_stats(self, response):
+        hits, misses = re.search(r'(\d+) hits (\d+) misses',
+                                 response['Server-Timing']).groups()
+        return int(hits), int(misses)
+
+    def test_server_timing(self):
+        """Ответ несёт замеры SQL, шаблонов, кэша и общего времени"""
+        response = self.client.get(reverse('posts:main_page'))
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'queries', 'tpl;dur=', 'cache;desc=',
+                       'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        self.assertNotIn('db;dur=0.0;desc="0 queries"', timing)
+
+    def test_cache_hits_and_misses(self):
+        """Первый запрос промахивается мимо кэша ленты, повторный попадает"""
+        first = self.cache_stats(self.client.get(reverse('posts:main_page')))
+        second = self.cache_stats(
+            self.client.get(reverse('posts:main_page')))
+        self.assertGreater(first[1], 0)
+        self.assertGreater(second[0], 0)
+        self.assertEqual(second[1], 0)
+
+    def test_metrics_endpoint(self):
+        """Гистограммы копятся по именам представлений posts и users"""
+        self.client.get(reverse('posts:main_page'))
+        self.client.get(reverse('posts:post_detail', args=[self.post.pk]))
+        self.client.get(reverse('users:login'))
+        self.client.get(reverse('about:author'))
+        response = self.get_metrics()
+        text = response.content.decode()
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertIn('yatube_db_queries_count{view="posts:main_page"} 1',
+                      text)
+        self.assertIn('view="posts:post_detail"', text)
+        self.assertIn('view="users:login"', text)
+        self.assertNotIn('about:', text)
+
+    def test_metrics_access(self):
+        """Страница метрик открыта по токену и сотрудникам, локальный
+        адрес доступа не даёт"""
+        url = reverse('metrics')
+        cases = (
+            ({}, 403),
+            ({'HTTP_AUTHORIZATION': 'Bearer wrong'}, 403),
+            ({'HTTP_AUTHORIZATION': f'Bearer {METRICS_TOKEN}'}, 200),
+        )
+        for extra, status in cases:
+            with self.subTest(extra=extra):
+                response = self.client.get(url, REMOTE_ADDR='127.0.0.1',
+                                           **extra)
+                self.assertEqual(response.status_code, status)
+        with override_settings(METRICS_TOKEN=''):
+            response = self.client.get(url, HTTP_AUTHORIZATION='Bearer ')
+            self.assertEqual(response.status_code, 403)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class TemplateProfileTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        template_profile.reset()
+        self.user = User.objects.create_user(username='Name')
+        for i in range(15):
+            Post.objects.create(text=f'Текст{i}', author=self.user)
+
+    def test_includes_profiled(self):
+        """Каждый include замеряется отдельно от шаблона страницы"""
+        enable_template_profiling()
+        self.addCleanup(disable_template_profiling)
+        self.client.get(reverse('posts:main_page'))
+        self.client.get(reverse('posts:main_page'))
+        stats = {name: (count, total, own)
+                 for name, count, total, own in template_profile.rows()}
+        self.assertEqual(stats['posts/index.html'][0], 2)
+        self.assertEqual(stats['posts/includes/paginator.html'][0], 2)
+        index_total, index_own = stats['posts/index.html'][1:]
+        self.assertLess(index_own, index_total)
+        self.assertGreaterEqual(
+            index_total - index_own,
+            stats['posts/includes/paginator.html'][1])
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_template_renders_total{template="posts/index.html"} 2',
+            metrics)
+
+    def test_disabled_by_default(self):
+        """Без TEMPLATE_PROFILING шаблоны не замеряются"""
+        self.client.get(reverse('posts:main_page'))
+        self.assertEqual(template_profile.rows(), [])
+
+    def test_profile_templates_command(self):
+        """Команда печатает шаблоны страниц, самые дорогие сверху"""
+        out = StringIO()
+        call_command('profile_templates', reverse('posts:main_page'),
+                     requests=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('posts/includes/paginator.html', out.getvalue())
+        self.assertRegex(lines[1], r' 2 ')
+        self.assertEqual(template_profile.rows()[0][0],
+                         lines[1].split()[0])
+        self.client.get(reverse('posts:main_page'))
+        self.assertEqual(template_profile.rows()[0][1], 2)
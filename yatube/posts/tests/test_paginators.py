@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import Page
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Post
+from posts.paginators import CursorPaginator, page_window
+
+
+User = get_user_model()
+TEST_OF_POST = 35
+PER_PAGE = 10
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Name')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый текст{i}', author=cls.user)
+            for i in range(TEST_OF_POST)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+
+    def get_paginator(self):
+        return CursorPaginator(Post.objects.all(), PER_PAGE, offset_pages=2)
+
+    def test_offset_pages(self):
+        """Первые страницы доступны по номеру"""
+        page = self.get_paginator().get_page(2)
+        self.assertIs(type(page), Page)
+        self.assertEqual([post.pk for post in page], self.expected[10:20])
+        self.assertTrue(page.has_next())
+        self.assertTrue(page.has_previous())
+        self.assertIsNotNone(page.next_cursor)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_cursor_walks_whole_feed(self):
+        """Курсоры проходят ленту вперёд и назад без пропусков"""
+        page = self.get_paginator().get_page(1)
+        self.assertIsNone(page.next_cursor)
+        page = self.get_paginator().get_page(2)
+        seen = list(self.expected[:10]) + [post.pk for post in page]
+        while page.has_next():
+            page = self.get_paginator().get_page(cursor=page.next_cursor)
+            seen.extend(post.pk for post in page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(page.number, 4)
+        self.assertEqual(len(page), 5)
+        page = self.get_paginator().get_page(cursor=page.previous_cursor)
+        self.assertEqual(page.number, 3)
+        self.assertEqual([post.pk for post in page], self.expected[20:30])
+
+    def test_no_count_query(self):
+        """Страница по курсору строится одним запросом"""
+        cursor = self.get_paginator().get_page(2).next_cursor
+        with self.assertNumQueries(1):
+            page = self.get_paginator().get_page(cursor=cursor)
+            list(page)
+
+    def test_broken_cursor_and_page(self):
+        """Испорченный курсор и номер страницы ведут на первую страницу"""
+        for kwargs in ({'cursor': 'broken'}, {'number': 'abc'},
+                       {'number': -3}):
+            with self.subTest(kwargs=kwargs):
+                page = self.get_paginator().get_page(**kwargs)
+                self.assertEqual(page.number, 1)
+                self.assertEqual(
+                    [post.pk for post in page], self.expected[:10]
+                )
+
+    def test_page_past_the_end(self):
+        """Номер страницы за концом ленты отдаёт последнюю страницу"""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE,
+                                    offset_pages=5)
+        page = paginator.get_page(5)
+        self.assertEqual(page.number, 4)
+        self.assertFalse(page.has_next())
+        self.assertEqual([post.pk for post in page], self.expected[30:])
+
+    def test_huge_page_number(self):
+        """Огромный номер страницы ограничен страницами по номеру
+        и не приводит к COUNT"""
+        for offset_pages, number in ((2, 2), (5, 4)):
+            paginator = CursorPaginator(Post.objects.all(), PER_PAGE,
+                                        offset_pages=offset_pages)
+            with self.subTest(offset_pages=offset_pages), \
+                    CaptureQueriesContext(connection) as queries:
+                page = paginator.get_page(10 ** 12)
+                self.assertEqual(page.number, number)
+            for query in queries:
+                self.assertNotIn('COUNT(', query['sql'])
+                self.assertNotIn(str(10 ** 12), query['sql'])
+
+    def test_page_window(self):
+        """Номера страниц не выходят за конец ленты и страницы по номеру"""
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE,
+                                    offset_pages=3)
+        cases = (
+            (1, None, [1, 2]),
+            (1, TEST_OF_POST, [1, 2, 3]),
+            (2, TEST_OF_POST, [1, 2, 3]),
+            (3, TEST_OF_POST, [1, 2, 3]),
+        )
+        for number, count, expected in cases:
+            with self.subTest(number=number, count=count):
+                page = paginator.get_page(number)
+                self.assertEqual(list(page_window(page, count)), expected)
+        page = paginator.get_page(cursor=paginator.get_page(3).next_cursor)
+        self.assertEqual(list(page_window(page, TEST_OF_POST)), [])
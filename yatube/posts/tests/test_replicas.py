@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTest(TransactionTestCase):
+    """Ленты читаются с реплики, записи и свежие авторы — с default.
+
+    Реплика — отдельный файл SQLite. Тест сам копирует в него базу
+    default через sync_replica(), всё записанное позже — отставание
+    реплики.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = dict(
+            connections.databases['default'],
+            NAME=os.path.join(cls.directory, 'replica.sqlite3'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections._connections.replica
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Старый пост')
+        self.sync_replica()
+
+    def sync_replica(self):
+        connections['replica'].close()
+        connections['default'].ensure_connection()
+        connections['replica'].ensure_connection()
+        connections['default'].connection.backup(
+            connections['replica'].connection)
+
+    def feed_texts(self, client, url):
+        cache.clear()
+        response = client.get(url)
+        return [post.text for post in response.context['page_obj']]
+
+    def test_feeds_read_from_replica(self):
+        """Ленты не видят записей, до которых реплика не доехала"""
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый пост')
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.feed_texts(self.reader_client, url),
+                                 ['Старый пост'])
+        self.sync_replica()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.feed_texts(self.reader_client, url),
+                                 ['Новый пост', 'Старый пост'])
+
+    def test_writer_reads_own_writes(self):
+        """После записи автор читает с default, остальные — с реплики"""
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Новый пост'})
+        self.assertTrue(Post.objects.filter(text='Новый пост').exists())
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertEqual(self.feed_texts(self.author_client, url),
+                         ['Новый пост', 'Старый пост'])
+        self.assertEqual(self.feed_texts(self.reader_client, url),
+                         ['Старый пост'])
+
+    def test_replica_page_not_shared_with_writer(self):
+        """Список постов, прочитанный с отставшей реплики, не попадает
+        из кэша к автору, читающему с default"""
+        self.author_client.post(reverse('posts:post_create'),
+                                {'text': 'Новый пост'})
+        url = reverse('posts:main_page')
+        response = self.client.get(url)
+        self.assertEqual([post.text for post in response.context['page_obj']],
+                         ['Старый пост'])
+        response = self.author_client.get(url)
+        self.assertEqual([post.text for post in response.context['page_obj']],
+                         ['Новый пост', 'Старый пост'])
+
+    def test_pin_expires(self):
+        """Без свежей записи автор тоже читает с реплики"""
+        self.author_client.get(reverse('posts:profile_follow',
+                                       kwargs={'username': 'reader'}))
+        Post.objects.create(author=self.author, text='Новый пост')
+        url = reverse('posts:main_page')
+        self.assertEqual(len(self.feed_texts(self.author_client, url)), 2)
+        with self.settings(REPLICA_PIN_SECONDS=0):
+            self.author_client.get(reverse('posts:profile_unfollow',
+                                           kwargs={'username': 'reader'}))
+        self.assertEqual(self.feed_texts(self.author_client, url),
+                         ['Старый пост'])
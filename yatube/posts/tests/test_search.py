@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.search import search_posts
+
+
+User = get_user_model()
+
+
+class PostSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Name')
+        self.cat = Post.objects.create(author=self.user,
+                                       text='Кошка спит на окне')
+        self.cats = Post.objects.create(
+            author=self.user, text='Кошка, кошка и ещё раз кошка')
+        self.dog = Post.objects.create(author=self.user,
+                                       text='Собака гуляет')
+
+    def test_ranked_results(self):
+        """Поиск находит посты и ставит релевантные первыми"""
+        self.assertEqual(search_posts('кошка'), [self.cats.pk, self.cat.pk])
+        self.assertEqual(search_posts('соб'), [self.dog.pk])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.dog.text = 'Собака и кошка'
+        self.dog.save()
+        self.assertIn(self.dog.pk, search_posts('кошка'))
+        cat_id = self.cat.pk
+        self.cat.delete()
+        self.assertNotIn(cat_id, search_posts('кошка'))
+
+    def test_special_characters(self):
+        """Спецсимволы запроса не ломают поиск"""
+        for query in ('"', 'кошка OR', '*', 'NEAR(', '-'):
+            with self.subTest(query=query):
+                search_posts(query)
+
+    def test_rebuild_command(self):
+        """Команда переиндексирует посты, созданные в обход сигналов"""
+        Post.objects.bulk_create([Post(author=self.user, text='Попугай')])
+        self.assertEqual(search_posts('попугай'), [])
+        call_command('rebuild_search_index', stdout=None)
+        self.assertEqual(len(search_posts('попугай')), 1)
+
+    def test_search_page(self):
+        """Страница поиска выводит найденные посты постранично"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кошка номер {i}')
+            for i in range(12)
+        )
+        call_command('rebuild_search_index', stdout=None)
+        response = self.client.get(reverse('posts:search'), {'q': 'кошка'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B0'
+                                      '&amp;page=2')
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'кошка', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 4)
+        self.assertNotIn(self.dog, response.context['page_obj'])
+
+    def test_admin_search(self):
+        """Поиск в админке идёт через индекс"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'собака'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dog])
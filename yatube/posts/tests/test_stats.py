@@ -0,0 +1,57 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Post
+
+
+User = get_user_model()
+
+
+class AuthorStatsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.follower = User.objects.create_user(username='follower')
+
+    def get_stats(self, user):
+        return AuthorStats.objects.get(author=user)
+
+    def test_counters_follow_mutations(self):
+        """Счётчики меняются вместе с постами и подписками"""
+        post = Post.objects.create(author=self.author, text='текст')
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(self.get_stats(self.author).posts_count, 1)
+        self.assertEqual(self.get_stats(self.author).followers_count, 1)
+        self.assertEqual(self.get_stats(self.follower).following_count, 1)
+        post.delete()
+        follow.delete()
+        stats = self.get_stats(self.author)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+        self.assertEqual(self.get_stats(self.follower).following_count, 0)
+
+    def test_rebuild_command(self):
+        """Команда исправляет разошедшиеся и отсутствующие счётчики"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'текст{i}') for i in range(3)
+        )
+        AuthorStats.objects.filter(author=self.follower).delete()
+        out = StringIO()
+        call_command('rebuild_author_stats', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(self.get_stats(self.author).posts_count, 3)
+        self.assertTrue(
+            AuthorStats.objects.filter(author=self.follower).exists())
+
+    def test_profile_reads_counters(self):
+        """Профиль показывает счётчики без COUNT по постам"""
+        Post.objects.create(author=self.author, text='текст')
+        Follow.objects.create(user=self.follower, author=self.author)
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Подписок: 0')
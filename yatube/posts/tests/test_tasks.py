@@ -0,0 +1,114 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Follow, Post, TimelineEntry
+from tasks.models import Job
+from tasks.queue import Worker, task
+
+User = get_user_model()
+
+calls = []
+
+
+@task(max_attempts=2)
+def flaky(value):
+    calls.append(value)
+    raise RuntimeError('сбой')
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=10)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        calls.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_write_returns_before_side_effects(self):
+        """Запись поста только ставит задачи, их выполняет воркер"""
+        self.client.post(reverse('posts:post_create'), {'text': 'Пост'})
+        post = Post.objects.get(text='Пост')
+        self.assertEqual(
+            sorted(Job.objects.values_list('name', flat=True)),
+            ['posts.tasks.fan_out_post', 'posts.tasks.index_post'])
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(Worker().run(burst=True), 2)
+        self.assertFalse(Job.objects.exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        response = Client().get(reverse('posts:search'), {'q': 'Пост'})
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется с растущей паузой и сдаётся"""
+        job = flaky.delay('раз')
+        worker = Worker()
+        started = timezone.now()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertTrue(worker.run_once())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('сбой', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=10))
+        self.assertFalse(worker.run_once())
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertTrue(worker.run_once())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(calls, ['раз', 'раз'])
+
+    def test_expired_lease_reclaimed(self):
+        """Задача упавшего воркера достаётся другому после срока аренды"""
+        now = timezone.now()
+        busy = remember.delay('занята')
+        lost = remember.delay('брошена')
+        Job.objects.filter(pk=busy.pk).update(
+            status=Job.RUNNING, locked_until=now + timedelta(minutes=5))
+        Job.objects.filter(pk=lost.pk).update(
+            status=Job.RUNNING, locked_until=now - timedelta(seconds=1))
+        self.assertEqual(Worker().run(burst=True), 1)
+        self.assertEqual(calls, ['брошена'])
+        self.assertEqual(list(Job.objects.values_list('pk', flat=True)),
+                         [busy.pk])
+
+    def test_delayed_job_waits(self):
+        """Задача с countdown не выполняется раньше срока"""
+        remember.delay('позже', countdown=60)
+        self.assertEqual(Worker().run(burst=True), 0)
+        self.assertEqual(calls, [])
+
+    def test_run_workers_command(self):
+        """run_workers --burst выполняет очередь и выходит"""
+        remember.delay('один')
+        remember.delay('два')
+        out = StringIO()
+        call_command('run_workers', processes=1, burst=True, stdout=out)
+        self.assertIn('Выполнено задач: 2', out.getvalue())
+        self.assertEqual(calls, ['один', 'два'])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager(self):
+        """При TASKS_EAGER задача выполняется сразу, ошибки не всплывают"""
+        self.assertIsNone(remember.delay('сразу'))
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertIsNone(flaky.delay('сразу'))
+        self.assertEqual(calls, ['сразу', 'сразу'])
+        self.assertFalse(Job.objects.exists())
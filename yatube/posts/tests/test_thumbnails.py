@@ -0,0 +1,135 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+from posts.thumbnails import (attach_thumbnails, generate_thumbnails,
+                              get_ready_thumbnails, thumbnail_file,
+                              variant_name)
+from tasks.models import Job
+from tasks.queue import Worker
+
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ThumbnailPipelineTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Name')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_image(self):
+        return SimpleUploadedFile(name='small.gif', content=SMALL_GIF,
+                                  content_type='image/gif')
+
+    def test_placeholder_until_ready(self):
+        """Пока миниатюры нет, в ленте выводится заглушка"""
+        Post.objects.create(text='Текст', author=self.user,
+                            image=self.get_image())
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Изображение обрабатывается')
+        self.assertNotContains(response, '<img class="card-img')
+
+    def test_thumbnails_generated_after_create(self):
+        """Миниатюры создаются после сохранения поста с картинкой"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': self.get_image()}
+        )
+        post = Post.objects.get()
+        self.assertTrue(post.image)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, '<img class="card-img my-2" '
+                                      'src="/media/cache/')
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_thumbnails_resolved_in_batch(self):
+        """Миниатюры страницы находятся одним запросом"""
+        posts = [
+            Post.objects.create(text=f'Текст{i}', author=self.user,
+                                image=self.get_image())
+            for i in range(3)
+        ]
+        for post in posts:
+            generate_thumbnails(post.pk, post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            attach_thumbnails(posts)
+        with self.assertNumQueries(0):
+            attach_thumbnails(posts)
+        for post in posts:
+            self.assertTrue(post.thumbnail_url.startswith('/media/cache/'))
+
+    def test_thumbnail_key_matches_sorl(self):
+        """Имя и ключ миниатюры совпадают с теми, что записывает
+        sorl-thumbnail: иначе готовые миниатюры не найдутся"""
+        post = Post.objects.create(text='Текст', author=self.user,
+                                   image=self.get_image())
+        for size, (geometry, options) in settings.POST_THUMBNAILS.items():
+            with self.subTest(size=size):
+                expected = get_thumbnail(post.image, geometry, **options)
+                file = thumbnail_file(ImageFile(post.image), geometry,
+                                      options)
+                self.assertEqual(file.name, expected.name)
+                self.assertEqual(file.key, expected.key)
+                self.assertIsNotNone(default.kvstore.get(file))
+
+    @override_settings(POST_IMAGE_FORMATS=('JPEG',))
+    def test_responsive_variants(self):
+        """Адаптивные версии сохраняются рядом с оригиналом и попадают
+        в srcset"""
+        post = Post.objects.create(text='Текст', author=self.user,
+                                   image=self.get_image())
+        generate_thumbnails(post.pk, post.image.name)
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, 'JPEG:480')
+        name = variant_name(post.image.name, 480, 'JPEG')
+        self.assertTrue(name.startswith('posts/'))
+        self.assertTrue(default_storage.exists(name))
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, f'srcset="/media/{name} 480w"')
+        self.assertContains(response, 'type="image/jpeg"')
+
+    @override_settings(TASKS_EAGER=False)
+    def test_generate_command_enqueues(self):
+        """generate_thumbnails ставит задачи, миниатюры создаёт воркер"""
+        post = Post.objects.create(text='Текст', author=self.user,
+                                   image=self.get_image())
+        Post.objects.create(text='Без картинки', author=self.user)
+        Job.objects.all().delete()
+        out = io.StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Поставлено в очередь картинок: 1', out.getvalue())
+        self.assertEqual(list(Job.objects.values_list('name', flat=True)),
+                         ['posts.thumbnails.generate_thumbnails'])
+        self.assertEqual(get_ready_thumbnails([post.image]), {})
+        Worker().run(burst=True)
+        self.assertIn(post.image.name, get_ready_thumbnails([post.image]))
@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+from posts.paginators import MergedPaginator
+from posts.timeline import FEED_KEYS, follow_feed, follow_sources
+from tasks.models import Job
+from tasks.queue import Worker
+
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.follower = User.objects.create_user(username='follower')
+        self.author = User.objects.create_user(username='author')
+        self.old_post = Post.objects.create(author=self.author,
+                                            text='старый пост')
+        self.client = Client()
+        self.client.force_login(self.follower)
+
+    def test_follow_fills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора"""
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': 'author'}))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=self.old_post).exists())
+
+    def test_new_post_fanned_out(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='новый пост')
+        self.assertEqual(list(follow_feed(self.follower).order_by(
+            '-pub_date')), [new_post, self.old_post])
+
+    def test_unfollow_clears_timeline(self):
+        """Отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': 'author'}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.follower).exists())
+        self.assertFalse(follow_feed(self.follower).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_read_on_demand(self):
+        """Посты популярных авторов читаются без раскладки по лентам"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='новый пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertIn(new_post, follow_feed(self.follower))
+        self.assertIn(self.old_post, follow_feed(self.follower))
+
+    @override_settings(TIMELINE_BACKFILL_SIZE=1, TASKS_EAGER=False)
+    def test_old_posts_backfilled_later(self):
+        """Старые посты сверх TIMELINE_BACKFILL_SIZE дораскладывает
+        задача"""
+        new_post = Post.objects.create(author=self.author, text='новый пост')
+        Job.objects.all().delete()
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(list(follow_feed(self.follower)), [new_post])
+        self.assertEqual(Worker().run(burst=True), 1)
+        self.assertEqual(list(follow_feed(self.follower).order_by(
+            '-pub_date')), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_former_celebrity_posts_fanned_out(self):
+        """Посты, вышедшие, пока автор был популярным, остаются в лентах,
+        когда подписчиков становится меньше порога"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(
+            post=new_post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(list(follow_feed(self.follower).order_by(
+            '-pub_date')), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_celebrity_posts_merged_into_pages(self):
+        """Страницы ленты с популярным автором сливают посты из
+        материализованной ленты и постов автора в общем порядке"""
+        celebrity = User.objects.create_user(username='celebrity')
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=celebrity)
+        Follow.objects.create(user=other, author=celebrity)
+        for i in range(4):
+            Post.objects.create(author=self.author, text=f'пост {i}')
+            Post.objects.create(author=celebrity, text=f'пост звезды {i}')
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        celebrities = [celebrity.pk]
+
+        def get_paginator():
+            return MergedPaginator(
+                follow_feed(self.follower, celebrities),
+                follow_sources(self.follower, celebrities),
+                3, offset_pages=1, keys=FEED_KEYS)
+
+        page = get_paginator().get_page(1)
+        seen = list(page)
+        while page.has_next():
+            page = get_paginator().get_page(cursor=page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, expected)
+        page = get_paginator().get_page(cursor=page.previous_cursor)
+        self.assertEqual(list(page), expected[3:6])
@@ -0,0 +1,158 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Group, Post, TimelineEntry
+from posts.search import search_posts
+
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class TransferTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.workdir, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return path
+
+    def import_posts(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_posts', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        """Импорт пишет посты пачками и обновляет ленты, счётчики и поиск"""
+        rows = [
+            {'text': f'Импортированный пост {i}', 'author': 'author',
+             'group': 'group' if i % 2 else '',
+             'pub_date': f'2020-01-{i + 1:02d}T10:00:00+00:00'}
+            for i in range(5)
+        ]
+        path = self.write('posts.jsonl', ''.join(
+            json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+        self.client.get(reverse('posts:main_page'))
+        out, _ = self.import_posts(path, '--batch-size', '2')
+        self.assertIn('Импортировано постов: 5', out)
+        posts = Post.objects.filter(author=self.author)
+        self.assertEqual(posts.count(), 5)
+        self.assertEqual(posts.first().pub_date.year, 2020)
+        self.assertEqual(self.group.posts.count(), 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(AuthorStats.objects.get(
+            author=self.author).posts_count, 5)
+        self.assertEqual(len(search_posts('импортированный')), 5)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_import_skips_bad_rows(self):
+        """Строки с неизвестным автором или группой пропускаются"""
+        path = self.write('posts.csv', (
+            'text,author,group\n'
+            'Хороший пост,author,group\n'
+            'Чужой автор,nobody,\n'
+            'Чужая группа,author,missing\n'
+            ',author,\n'
+        ))
+        out, err = self.import_posts(path)
+        self.assertIn('Импортировано постов: 1', out)
+        self.assertIn('пропущено строк: 3', out)
+        self.assertIn('Строка 3: нет автора', err)
+        self.assertEqual(Post.objects.get().text, 'Хороший пост')
+
+    def test_import_skips_bad_json(self):
+        """Неразборчивая строка JSON пропускается с номером строки файла,
+        остальные посты пачки импортируются"""
+        path = self.write('posts.jsonl', (
+            '{"text": "Первый", "author": "author"}\n'
+            '\n'
+            'not json\n'
+            '[1, 2]\n'
+            '{"text": "Второй", "author": "author"}\n'
+        ))
+        out, err = self.import_posts(path)
+        self.assertIn('Импортировано постов: 2', out)
+        self.assertIn('Строка 3: неверный JSON', err)
+        self.assertIn('Строка 4: строка не объект JSON', err)
+
+    def test_backend_without_returned_ids(self):
+        """На базе, не возвращающей id из bulk_create, импорт сразу
+        отказывается"""
+        path = self.write('posts.jsonl',
+                          '{"text": "Текст", "author": "author"}\n')
+        features = connection.features
+        with mock.patch.object(connection, 'vendor', 'mysql'), \
+                mock.patch.object(features, 'can_return_ids_from_bulk_insert',
+                                  False):
+            with self.assertRaisesMessage(CommandError, 'mysql'):
+                self.import_posts(path)
+        self.assertFalse(Post.objects.exists())
+
+    def test_create_authors(self):
+        """С --create-authors неизвестные авторы заводятся"""
+        path = self.write('posts.jsonl',
+                          '{"text": "Текст", "author": "newcomer"}\n')
+        self.import_posts(path, '--create-authors')
+        self.assertTrue(Post.objects.filter(
+            author__username='newcomer').exists())
+
+    def test_export_import_roundtrip(self):
+        """Выгрузка с картинками загружается обратно"""
+        images = os.path.join(self.workdir, 'images')
+        os.makedirs(os.path.join(images, 'posts'))
+        with open(os.path.join(images, 'posts', 'small.gif'), 'wb') as image:
+            image.write(SMALL_GIF)
+        source = self.write('source.jsonl', json.dumps({
+            'text': 'С картинкой', 'author': 'author',
+            'image': 'posts/small.gif'}) + '\n')
+        self.import_posts(source, '--images-dir', images)
+        Post.objects.create(text='Без картинки', author=self.reader,
+                            group=self.group)
+        for fmt in ('jsonl', 'csv'):
+            with self.subTest(fmt=fmt):
+                path = os.path.join(self.workdir, f'export.{fmt}')
+                exported = os.path.join(self.workdir, f'export-{fmt}')
+                call_command('export_posts', path, '--chunk-size', '1',
+                             '--images-dir', exported, stderr=io.StringIO())
+                before = Post.objects.count()
+                self.import_posts(path, '--images-dir', exported)
+                self.assertEqual(Post.objects.count(), before * 2)
+        copied = Post.objects.filter(text='С картинкой').exclude(
+            image='').order_by('pk').last()
+        self.assertTrue(os.path.exists(copied.image.path))
@@ -2,7 +2,9 @@ from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client
 from django.urls import reverse
+from posts.cards import card_urls, render_cards
 from posts.models import Follow, Post, Group, Comment
+from posts.thumbnails import attach_thumbnails
 from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 
@@ -188,6 +190,7 @@ class PostPageTests(TestCase):
 
 class PaginatorTestViews(TestCase):
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='Name')
         self.authorized_client = Client()
@@ -285,3 +288,315 @@ class FollowTest(TestCase):
         self.assertEqual(post_text, 'test text')
         response = self.client_auth_following.get('/follow/')
         self.assertNotContains(response, 'test text')
+
+
+class FeedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Name')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        for i in range(TEST_OF_POST):
+            Post.objects.create(text=f'Тестовый текст{i}', author=self.user)
+
+    def test_header_not_cached(self):
+        """Кэш ленты не подменяет шапку другого пользователя"""
+        self.client.get(reverse('posts:main_page'))
+        response = self.authorized_client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Пользователь: Name')
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertNotContains(response, 'Пользователь: Name')
+
+    def test_pages_cached_separately(self):
+        """Страницы ленты кэшируются по отдельности"""
+        first = self.client.get(reverse('posts:main_page'))
+        second = self.client.get(reverse('posts:main_page') + '?page=2')
+        self.assertEqual(len(first.context['page_obj']), 10)
+        self.assertEqual(len(second.context['page_obj']), 3)
+        second = self.client.get(reverse('posts:main_page') + '?page=2')
+        self.assertEqual(len(second.context['page_obj']), 3)
+
+    def test_edited_post_card_refreshed(self):
+        """Карточка поста перерисовывается после редактирования"""
+        post = Post.objects.latest('pub_date')
+        self.client.get(reverse('posts:main_page'))
+        post.text = 'Изменённый текст'
+        post.save()
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Изменённый текст')
+
+    def test_mutations_invalidate_feeds(self):
+        """Правка, удаление поста и подписка сразу видны в лентах"""
+        group = Group.objects.create(title='Группа', slug='group')
+        other = Group.objects.create(title='Другая', slug='other')
+        post = Post.objects.create(text='Пост группы', author=self.user,
+                                   group=group)
+        group_url = reverse('posts:group_list', kwargs={'slug': 'group'})
+        other_url = reverse('posts:group_list', kwargs={'slug': 'other'})
+        self.assertIn(post, self.client.get(group_url).context['page_obj'])
+        self.client.get(other_url)
+        post.group = other
+        post.save()
+        self.assertNotIn(post, self.client.get(group_url).context['page_obj'])
+        self.assertIn(post, self.client.get(other_url).context['page_obj'])
+        follower = User.objects.create_user(username='follower')
+        self.client.force_login(follower)
+        self.assertNotIn(post, self.client.get(
+            reverse('posts:follow_index')).context['page_obj'])
+        Follow.objects.create(user=follower, author=self.user)
+        self.assertIn(post, self.client.get(
+            reverse('posts:follow_index')).context['page_obj'])
+        post_id = post.pk
+        post.delete()
+        page = self.client.get(reverse('posts:follow_index')).context[
+            'page_obj']
+        self.assertNotIn(post_id, [item.pk for item in page])
+
+
+class PostCardTest(TestCase):
+    """Карточки лент рендерятся одним компонентом и берутся из кэша"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='user.name+tag@mail', first_name='Имя')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.create(text='Текст', author=self.author,
+                            group=self.group)
+
+    def get_posts(self):
+        posts = list(Post.objects.for_feed())
+        attach_thumbnails(posts)
+        return posts
+
+    def test_urls_match_reverse(self):
+        """Готовые адреса карточки совпадают с reverse"""
+        post = self.get_posts()[0]
+        self.assertEqual(card_urls(post), {
+            'profile': reverse('posts:profile',
+                               args=[self.author.username]),
+            'detail': reverse('posts:post_detail', args=[post.pk]),
+            'group': reverse('posts:group_list', args=['group']),
+        })
+
+    def test_card_cached_per_version(self):
+        """Карточка рендерится заново только при смене версии поста,
+        имени автора или группы"""
+        posts = self.get_posts()
+        render_cards(posts)
+        posts[0].text = 'Не из базы'
+        self.assertIn('Текст', render_cards(posts)[0])
+        self.author.first_name = 'Новое'
+        self.author.save()
+        self.assertIn('Новое', render_cards(self.get_posts())[0])
+
+    def test_shared_by_feeds(self):
+        """Все ленты выводят одну и ту же карточку"""
+        urls = [
+            reverse('posts:main_page'),
+            reverse('posts:group_list', args=['group']),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:search') + '?q=Текст',
+        ]
+        card = render_cards(self.get_posts())[0]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), card, html=True)
+
+
+class FeedQueriesTest(TestCase):
+    """Число запросов ленты не зависит от числа постов на странице"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        self.user = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=self.user, author=self.author)
+        for i in range(TEST_OF_POST):
+            Post.objects.create(text=f'Текст{i}', author=self.author,
+                                group=self.group)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertFeedQueries(self, client, url, queries):
+        for page in ('', '?page=2'):
+            with self.subTest(url=url, page=page):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    client.get(url + page)
+
+    # На холодном кэше к странице добавляется ограниченный COUNT для
+    # номеров соседних страниц, профиль берёт число постов из счётчика.
+    def test_index_queries(self):
+        self.assertFeedQueries(self.client, reverse('posts:main_page'), 2)
+
+    def test_group_queries(self):
+        self.assertFeedQueries(
+            self.client,
+            reverse('posts:group_list', kwargs={'slug': 'group'}), 3)
+
+    def test_profile_queries(self):
+        self.assertFeedQueries(
+            self.client,
+            reverse('posts:profile', kwargs={'username': 'author'}), 2)
+
+    def test_follow_queries(self):
+        self.assertFeedQueries(
+            self.authorized_client, reverse('posts:follow_index'), 5)
+
+    def test_count_cached(self):
+        """Число постов считается один раз на поколение ленты"""
+        url = reverse('posts:main_page')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url + '?page=2')
+        self.assertEqual(list(response.context['page_obj'].page_window),
+                         [1, 2])
+
+
+class CommentWindowTest(TestCase):
+    """Комментарии поста выводятся окнами фиксированного размера"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='Name')
+        self.post = Post.objects.create(text='Текст', author=self.user)
+        for i in range(45):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text=f'Комментарий{i}')
+        self.detail_url = reverse('posts:post_detail',
+                                  kwargs={'post_id': self.post.pk})
+        self.comments_url = reverse('posts:post_comments',
+                                    kwargs={'post_id': self.post.pk})
+
+    def test_comments_count(self):
+        """Счётчик комментариев поста следует за их созданием и удалением"""
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 45)
+        Comment.objects.filter(post=self.post).first().delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 44)
+
+    def test_detail_first_window(self):
+        """Страница поста выводит только первое окно комментариев"""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, 'Комментарий0')
+        self.assertContains(response, 'Комментарии: 45')
+        self.assertIsNotNone(response.context['comments_next'])
+
+    def test_next_windows(self):
+        """Фрагменты догружают все комментарии без повторов"""
+        texts = []
+        after = ''
+        while after is not None:
+            data = self.client.get(
+                self.comments_url, {'after': after, 'format': 'json'}
+            ).json()
+            self.assertEqual(data['count'], 45)
+            texts.extend(comment['text'] for comment in data['comments'])
+            after = data['next']
+        self.assertEqual(texts, [f'Комментарий{i}' for i in range(45)])
+
+    def test_html_fragment(self):
+        """Без format=json отдаётся HTML-фрагмент со ссылкой дальше"""
+        response = self.client.get(self.comments_url)
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertContains(response, 'data-comments-url')
+        comments = response.context['comments']
+        self.assertEqual(comments[-1].text, 'Комментарий19')
+        self.assertContains(response, 'Комментарий19')
+
+    def test_window_queries(self):
+        """Число запросов окна не зависит от числа комментариев"""
+        with self.assertNumQueries(2):
+            self.client.get(self.comments_url, {'format': 'json'})
+
+
+class ConditionalGetTest(TestCase):
+    """Повторный запрос неизменившейся страницы получает 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(text='Текст', author=self.author,
+                                        group=self.group)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def revalidate(self, client, url, etag):
+        return client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_not_modified(self):
+        """Без изменений страницы отвечают 304, после правки поста — 200"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(self.client, url, etag), 304)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(self.client, url, etag), 200)
+
+    def test_etag_depends_on_user(self):
+        """Гость и пользователь не получают чужую версию страницы"""
+        url = reverse('posts:main_page')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(self.reader_client, url, etag), 200)
+
+    def test_comment_and_follow_change_etag(self):
+        """Комментарий и подписка меняют ETag поста и профиля"""
+        detail, profile = self.urls[3], self.urls[2]
+        detail_etag = self.reader_client.get(detail)['ETag']
+        profile_etag = self.reader_client.get(profile)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        self.assertEqual(
+            self.revalidate(self.reader_client, detail, detail_etag), 200)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(self.reader_client, profile, profile_etag), 200)
+
+    def test_group_and_author_change_etag(self):
+        """Правка группы и имени автора меняет ETag страниц, где они
+        выводятся"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(self.client, url, etag), 200)
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        self.author.first_name = 'Новое'
+        self.author.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Новое')
+
+    def test_login_keeps_etag(self):
+        """Вход пользователя не сбрасывает ETag чужих страниц"""
+        url = reverse('posts:main_page')
+        etag = self.client.get(url)['ETag']
+        self.reader.set_password('secret')
+        self.reader.save()
+        self.assertTrue(Client().login(username='reader', password='secret'))
+        self.assertEqual(self.revalidate(self.client, url, etag), 304)
+
+    def test_not_modified_skips_rendering(self):
+        """Ответ 304 ленты не требует запросов к базе"""
+        url = reverse('posts:main_page')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
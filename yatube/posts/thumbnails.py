@@ -0,0 +1,182 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from tasks.queue import task
+
+from .cache import bump_generations
+from .models import Post
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+VARIANT_QUALITY = 80
+
+# thumbnail_file и get_ready_thumbnails опираются на внутренности
+# sorl-thumbnail 12.7.0, закреплённого в requirements.txt: методы
+# _get_format и _get_thumbnail_filename и поле extra_options бэкенда,
+# кэш хранилища cached_db и add_prefix. Перед обновлением sorl-thumbnail
+# их нужно сверить с новой версией; если имя или ключ миниатюры
+# разойдутся с теми, что записывает get_thumbnail, упадёт
+# test_thumbnail_key_matches_sorl.
+
+
+def thumbnail_file(source, geometry, options):
+    """Файл миниатюры так, как его назовёт sorl-thumbnail, без генерации."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def get_ready_thumbnails(images, size='card'):
+    """Готовые миниатюры для набора картинок по имени картинки.
+
+    Для хранилища sorl-thumbnail на кэше и БД все записи читаются
+    одним get_many и, для промахов, одним запросом к таблице.
+    Картинок, миниатюры которых ещё создаются, в ответе нет.
+    """
+    geometry, options = settings.POST_THUMBNAILS[size]
+    files = {
+        image.name: thumbnail_file(ImageFile(image), geometry, options)
+        for image in images if image
+    }
+    kvstore = default.kvstore
+    empty = cached_db_kvstore.EMPTY_VALUE
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        ready = {name: kvstore.get(file) for name, file in files.items()}
+        return {name: file for name, file in ready.items() if file}
+    names = {add_prefix(file.key): name for name, file in files.items()}
+    found = kvstore.cache.get_many(names)
+    missing = [key for key in names if key not in found]
+    if missing:
+        rows = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        fetched = {key: rows.get(key, empty) for key in missing}
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        found.update(fetched)
+    return {
+        names[key]: deserialize_image_file(value)
+        for key, value in found.items() if value != empty
+    }
+
+
+def supported_formats():
+    Image.init()
+    return [fmt for fmt in settings.POST_IMAGE_FORMATS if fmt in Image.SAVE]
+
+
+def variant_name(image_name, width, fmt):
+    root, _ = os.path.splitext(image_name)
+    return f'{root}_{width}w.{fmt.lower()}'
+
+
+def generate_variants(image_name):
+    """Сохраняет рядом с оригиналом версии картинки нескольких ширин
+    в современных форматах.
+
+    Возвращает описание созданных версий для Post.image_variants.
+    """
+    formats = supported_formats()
+    if not formats:
+        return ''
+    with default_storage.open(image_name) as source:
+        image = Image.open(source)
+        image.load()
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    aspect_width, aspect_height = settings.POST_IMAGE_ASPECT
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    widths = [width for width in widths if width <= image.width] or widths[:1]
+    produced = []
+    for width in widths:
+        height = round(width * aspect_height / aspect_width)
+        variant = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        for fmt in formats:
+            buffer = BytesIO()
+            variant.save(buffer, fmt, quality=VARIANT_QUALITY)
+            name = variant_name(image_name, width, fmt)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+            produced.append(f'{fmt}:{width}')
+    return ' '.join(produced)
+
+
+def image_sources(post):
+    """Пары (MIME-тип, srcset) для <picture> по готовым версиям."""
+    widths = {}
+    for variant in post.image_variants.split():
+        fmt, width = variant.split(':')
+        widths.setdefault(fmt, []).append(int(width))
+    return [
+        (MIME_TYPES[fmt], ', '.join(
+            f'{default_storage.url(variant_name(post.image.name, width, fmt))}'
+            f' {width}w' for width in widths[fmt]
+        ))
+        for fmt in MIME_TYPES if fmt in widths
+    ]
+
+
+def attach_thumbnails(posts, size='card'):
+    """Проставляет постам thumbnail_url и image_sources до рендеринга
+    шаблона."""
+    posts = list(posts)
+    ready = get_ready_thumbnails([post.image for post in posts], size)
+    for post in posts:
+        thumbnail = ready.get(post.image.name) if post.image else None
+        post.thumbnail_url = thumbnail.url if thumbnail else None
+        post.image_sources = image_sources(post) if thumbnail else []
+
+
+@task(max_attempts=3)
+def generate_thumbnails(post_id, image_name):
+    """Создаёт адаптивные версии и все миниатюры из POST_THUMBNAILS
+    для картинки поста."""
+    variants = generate_variants(image_name)
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        default.backend.get_thumbnail(image_name, geometry, **options)
+    # Новая метка версии сбрасывает закэшированную карточку
+    # с заглушкой вместо картинки, а новые поколения — ETag страниц.
+    Post.objects.filter(pk=post_id).update(
+        image_variants=variants, updated=timezone.now()
+    )
+    for author_id, group_id in Post.objects.filter(
+            pk=post_id).values_list('author_id', 'group_id'):
+        feeds = ['index', f'profile:{author_id}', f'post:{post_id}']
+        if group_id is not None:
+            feeds.append(f'group:{group_id}')
+        bump_generations(*feeds)
+
+
+def schedule_thumbnails(post):
+    """Ставит генерацию миниатюр в очередь задач после фиксации
+    транзакции: при TASKS_EAGER долгая генерация не держит её
+    открытой."""
+    if not post.image:
+        return
+    post_id, image_name = post.pk, post.image.name
+    transaction.on_commit(
+        lambda: generate_thumbnails.delay(post_id, image_name))
@@ -0,0 +1,176 @@
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+BATCH_SIZE = 500
+FEED_KEYS = ('feed_date', 'feed_key')
+
+
+def celebrity_authors(author_ids):
+    """Авторы из author_ids, чьи посты читаются без раскладки по лентам."""
+    return list(AuthorStats.objects.filter(
+        author_id__in=author_ids,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Возвращает id пользователей, в ленты которых попал пост.
+    """
+    if celebrity_authors([post.author_id]):
+        return []
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post.pk,
+                       author_id=post.author_id, pub_date=post.pub_date)
+         for user_id in followers],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    return followers
+
+
+def fan_out_posts(posts):
+    """Раскладывает пачку новых постов по лентам подписчиков их авторов.
+
+    Подписчики каждого автора читаются один раз на пачку. Возвращает
+    множество id пользователей, в ленты которых попали посты.
+    """
+    by_author = {}
+    for post in posts:
+        by_author.setdefault(post.author_id, []).append(post)
+    for author_id in celebrity_authors(list(by_author)):
+        del by_author[author_id]
+    followers = {}
+    follows = Follow.objects.filter(author_id__in=list(by_author))
+    for user_id, author_id in follows.values_list('user_id', 'author_id'):
+        followers.setdefault(author_id, []).append(user_id)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post.pk,
+                       author_id=author_id, pub_date=post.pub_date)
+         for author_id, users in followers.items()
+         for user_id in users for post in by_author[author_id]),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    return {user_id for users in followers.values() for user_id in users}
+
+
+def add_author(user_id, author_id):
+    """Добавляет в ленту пользователя последние посты нового автора.
+
+    Сразу раскладываются TIMELINE_BACKFILL_SIZE последних постов.
+    Возвращает True, если у автора есть более старые: их дозаливает
+    задача backfill_timeline.
+    """
+    if celebrity_authors([author_id]):
+        return False
+    size = settings.TIMELINE_BACKFILL_SIZE
+    posts = list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk').values_list('pk', 'pub_date')[:size + 1])
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                       pub_date=pub_date)
+         for pk, pub_date in posts[:size]],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    return len(posts) > size
+
+
+def backfill(author_id, user_ids=None):
+    """Раскладывает все посты автора по лентам его подписчиков.
+
+    user_ids ограничивает подписчиков, отписавшиеся пропускаются.
+    Уже разложенные посты не дублируются. Возвращает id
+    пользователей, ленты которых дополнены.
+    """
+    if celebrity_authors([author_id]):
+        return []
+    follows = Follow.objects.filter(author_id=author_id)
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+    followers = list(follows.values_list('user_id', flat=True))
+    if not followers:
+        return []
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')
+    batch = []
+    for pk, pub_date in posts.iterator(chunk_size=BATCH_SIZE):
+        batch.extend(
+            TimelineEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                          pub_date=pub_date)
+            for user_id in followers
+        )
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    return followers
+
+
+def left_celebrities(author_id):
+    """Стал ли автор после потери подписчика снова обычным.
+
+    Пока он был популярным, его посты не раскладывались, и теперь
+    их нужно разложить подписчикам.
+    """
+    followers = AuthorStats.objects.filter(author_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    return followers == settings.TIMELINE_FANOUT_LIMIT - 1
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def followed_celebrities(user):
+    return celebrity_authors(
+        Follow.objects.filter(user=user).values('author_id')
+    )
+
+
+def timeline_posts(user):
+    return Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_key=F('timeline_entries__post_id')
+    )
+
+
+def follow_feed(user, celebrities=None):
+    """Посты ленты подписок, упорядочиваемые по FEED_KEYS.
+
+    Без популярных авторов лента читается диапазоном по индексу
+    материализованной ленты. Посты авторов с огромным числом
+    подписчиков добавляются при чтении, и тогда ключом служат
+    поля самого поста. Страницы такой ленты собираются из
+    follow_sources, а этот запрос нужен для выборки по id и подсчёта.
+    """
+    if celebrities is None:
+        celebrities = followed_celebrities(user)
+    if not celebrities:
+        return timeline_posts(user)
+    return Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=celebrities)
+    ).annotate(feed_date=F('pub_date'), feed_key=F('pk'))
+
+
+def follow_sources(user, celebrities):
+    """Непересекающиеся части ленты подписок для MergedPaginator.
+
+    Материализованная лента читается по индексу (user, pub_date),
+    посты каждого популярного автора — по индексу (author, pub_date),
+    и ни один источник не сортируется целиком.
+    """
+    sources = [timeline_posts(user).exclude(author_id__in=celebrities)]
+    sources.extend(
+        Post.objects.filter(author_id=author_id).annotate(
+            feed_date=F('pub_date'), feed_key=F('pk'))
+        for author_id in celebrities
+    )
+    return sources
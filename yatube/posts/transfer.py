@@ -0,0 +1,255 @@
+"""Потоковый импорт и экспорт постов в JSON Lines и CSV.
+
+Строки читаются и пишутся генераторами, поэтому память не растёт
+с объёмом файла. Импорт пишет посты пачками через bulk_create и сам
+делает то, что для одиночного поста делают сигналы: раскладывает
+посты по лентам, индексирует для поиска, сдвигает счётчики и
+поколения кэша, ставит в очередь миниатюры.
+"""
+import csv
+import itertools
+import json
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import timeline
+from .cache import bump_generations
+from .models import AuthorStats, Group, Post
+from .search import get_backend as get_search_backend
+from .thumbnails import schedule_thumbnails
+
+User = get_user_model()
+
+FIELDS = ('id', 'text', 'pub_date', 'author', 'group', 'image')
+FORMATS = ('jsonl', 'csv')
+
+
+class RowError(Exception):
+    """Строку нельзя превратить в пост."""
+
+
+def read_rows(stream, fmt):
+    """Пары из номера строки файла и словаря строки, по одной.
+
+    Вместо словаря строки JSON, которую не удалось разобрать,
+    приходит RowError: импорт её пропустит, а не оборвётся.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, RowError(f'неверный JSON: {error}')
+            continue
+        if not isinstance(row, dict):
+            row = RowError('строка не объект JSON')
+        yield number, row
+
+
+def write_rows(stream, rows, fmt):
+    """Пишет словари строк по одной, возвращает их число."""
+    total = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+        for total, row in enumerate(rows, 1):
+            writer.writerow(row)
+        return total
+    for total, row in enumerate(rows, 1):
+        stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return total
+
+
+def export_rows(queryset=None, chunk_size=2000, images_dir=None):
+    """Строки экспорта постов, читаемые с сервера кусками."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    rows = queryset.order_by('pk').values_list(
+        'pk', 'text', 'pub_date', 'author__username', 'group__slug', 'image'
+    )
+    for pk, text, pub_date, author, group, image in rows.iterator(
+            chunk_size=chunk_size):
+        if image and images_dir:
+            copy_image_out(image, images_dir)
+        yield {
+            'id': pk,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'author': author,
+            'group': group or '',
+            'image': image or '',
+        }
+
+
+def copy_image_out(name, images_dir):
+    target = os.path.join(images_dir, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with default_storage.open(name) as source, open(target, 'wb') as output:
+        for chunk in source.chunks():
+            output.write(chunk)
+
+
+def bulk_create_posts(posts):
+    """bulk_create постов с датами публикации из самих объектов.
+
+    auto_now_add при вставке заменяет pub_date текущим временем, поэтому
+    даты возвращаются вторым запросом в той же транзакции: читатели
+    не увидят посты с неверной датой. Id постов, если база их не
+    вернула, проставляет assign_pks.
+    """
+    dates = [post.pub_date for post in posts]
+    with transaction.atomic():
+        Post.objects.bulk_create(posts)
+        if posts[0].pk is None:
+            assign_pks(posts)
+        for post, pub_date in zip(posts, dates):
+            post.pub_date = pub_date
+        Post.objects.bulk_update(posts, ['pub_date'])
+    return posts
+
+
+class PostImporter:
+    """Импорт постов пачками по batch_size строк.
+
+    Авторы и группы ищутся по username и slug одним запросом на пачку
+    и запоминаются на весь импорт. Картинки берутся из images_dir по
+    пути из поля image. Строки с ошибками пропускаются и попадают
+    в errors вместе с номером.
+
+    Лентам и поиску нужны id вставленных постов: база должна
+    возвращать их из bulk_create, для SQLite их проставляет
+    assign_pks.
+    """
+
+    def __init__(self, batch_size=1000, images_dir=None,
+                 create_authors=False):
+        if not (connection.features.can_return_ids_from_bulk_insert
+                or connection.vendor == 'sqlite'):
+            raise ImproperlyConfigured(
+                f'Импорт постов не поддерживает {connection.vendor}: '
+                f'база не возвращает id из bulk_create'
+            )
+        self.batch_size = batch_size
+        self.images_dir = images_dir
+        self.create_authors = create_authors
+        self.authors = {}
+        self.groups = {}
+        self.imported = 0
+        self.errors = []
+
+    def run(self, rows):
+        """Импортирует пары (номер, строка) из read_rows."""
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return self.imported
+            self.import_batch(batch)
+
+    def import_batch(self, batch):
+        self.errors.extend((number, str(row)) for number, row in batch
+                           if isinstance(row, RowError))
+        batch = [(number, row) for number, row in batch
+                 if not isinstance(row, RowError)]
+        self.resolve(batch)
+        posts = []
+        for number, row in batch:
+            try:
+                posts.append(self.build_post(row))
+            except RowError as error:
+                self.errors.append((number, str(error)))
+        if posts:
+            self.save(posts)
+            self.imported += len(posts)
+
+    def resolve(self, batch):
+        usernames = {row.get('author') for _, row in batch} - set(
+            self.authors)
+        self.authors.update(User.objects.filter(
+            username__in=usernames).values_list('username', 'pk'))
+        if self.create_authors:
+            for username in usernames - set(self.authors) - {None, ''}:
+                self.authors[username] = User.objects.create_user(
+                    username=username).pk
+        slugs = {row.get('group') for _, row in batch} - set(self.groups)
+        self.groups.update(Group.objects.filter(
+            slug__in=slugs).values_list('slug', 'pk'))
+
+    def build_post(self, row):
+        text = row.get('text')
+        if not text:
+            raise RowError('пустой текст')
+        author_id = self.authors.get(row.get('author'))
+        if author_id is None:
+            raise RowError(f'нет автора {row.get("author")!r}')
+        group_id = None
+        if row.get('group'):
+            group_id = self.groups.get(row['group'])
+            if group_id is None:
+                raise RowError(f'нет группы {row["group"]!r}')
+        pub_date = timezone.now()
+        if row.get('pub_date'):
+            pub_date = parse_datetime(row['pub_date'])
+            if pub_date is None:
+                raise RowError(f'неверная дата {row["pub_date"]!r}')
+        post = Post(text=text, author_id=author_id, group_id=group_id,
+                    pub_date=pub_date)
+        if row.get('image'):
+            post.image = self.store_image(row['image'])
+        return post
+
+    def store_image(self, name):
+        if self.images_dir is None:
+            raise RowError('картинки без --images-dir')
+        path = os.path.join(self.images_dir, name)
+        if not os.path.isfile(path):
+            raise RowError(f'нет файла {path}')
+        upload_to = Post._meta.get_field('image').upload_to
+        with open(path, 'rb') as source:
+            return default_storage.save(
+                os.path.join(upload_to, os.path.basename(name)), File(source)
+            )
+
+    def save(self, posts):
+        with transaction.atomic():
+            bulk_create_posts(posts)
+            followers = timeline.fan_out_posts(posts)
+            get_search_backend().update_many(posts)
+            counts = {}
+            for post in posts:
+                counts[post.author_id] = counts.get(post.author_id, 0) + 1
+                schedule_thumbnails(post)
+            for author_id, count in counts.items():
+                AuthorStats.objects.change(author_id, posts_count=count)
+        feeds = ['index']
+        feeds.extend(f'profile:{author_id}' for author_id in counts)
+        feeds.extend(f'group:{group_id}' for group_id in {
+            post.group_id for post in posts} - {None})
+        feeds.extend(f'follow:{user_id}' for user_id in followers)
+        bump_generations(*feeds)
+
+
+def assign_pks(posts):
+    """Проставляет id постам, которые bulk_create вставил без них.
+
+    Вызывается в той же транзакции сразу после вставки: SQLite держит
+    блокировку записи до её конца, поэтому последние len(posts) строк
+    таблицы — ровно эти посты в том же порядке.
+    """
+    pks = Post.objects.order_by('-pk').values_list(
+        'pk', flat=True)[:len(posts)]
+    for post, pk in zip(posts, reversed(list(pks))):
+        post.pk = pk
@@ -1,76 +1,217 @@
-from django.views.decorators.cache import cache_page
+from urllib.parse import urlencode
 
 from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Follow, Group, Post, User
+from django.views.decorators.http import condition
+from .models import AuthorStats, Follow, Group, Post, User
 from .forms import CommentForm, PostForm
+from .cache import get_cached_count, get_cached_page, view_etag
+from .paginators import (CursorPaginator, MergedPaginator, keyset_window,
+                         page_window)
+from .search import search_posts
+from .serializers import comment_row
+from .thumbnails import attach_thumbnails, schedule_thumbnails
+from .timeline import (FEED_KEYS, follow_feed, follow_sources,
+                       followed_celebrities)
 from django.contrib.auth.decorators import login_required
+from core.routers import pin_to_primary, read_from_replica
 
 COUNT_OBJ = 10
+OFFSET_PAGES = 5
+COMMENTS_WINDOW = 20
 
 
-def get_page_context(post_list, request):
-    paginator = Paginator(post_list, COUNT_OBJ)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def get_page_context(post_list, request, feeds=None, keys=None,
+                     count=None, windowed=True, sources=None):
+    """Страница ленты. Для ссылок на соседние страницы нужно число
+    постов: его можно передать в count, иначе для лент feeds оно
+    считается не дальше страниц, доступных по номеру. Если лента
+    собирается из нескольких запросов, они передаются в sources."""
+    if sources:
+        paginator = MergedPaginator(post_list, sources, COUNT_OBJ,
+                                    OFFSET_PAGES, keys)
+    else:
+        paginator = CursorPaginator(post_list, COUNT_OBJ, OFFSET_PAGES, keys)
+    number = request.GET.get('page')
+    cursor = request.GET.get('cursor')
+    if feeds is None:
+        page_obj = paginator.get_page(number, cursor)
+    else:
+        page_obj = get_cached_page(paginator, feeds, number, cursor)
+    if windowed:
+        if (count is None and feeds is not None
+                and page_obj.number <= OFFSET_PAGES):
+            count = get_cached_count(post_list, feeds,
+                                     COUNT_OBJ * OFFSET_PAGES + 1)
+        page_obj.page_window = page_window(page_obj, count)
+    attach_thumbnails(page_obj)
     return {
         'page_obj': page_obj,
     }
 
 
-@cache_page(20, key_prefix='index_page')
+def page_object(request, queryset, **lookup):
+    """Объект страницы или 404, загруженный один раз на запрос:
+    его делят функция ETag и само представление."""
+    if not hasattr(request, 'page_object'):
+        request.page_object = get_object_or_404(queryset, **lookup)
+    return request.page_object
+
+
+def get_group(request, slug):
+    return page_object(request, Group.objects.all(), slug=slug)
+
+
+def get_author(request, username):
+    return page_object(request, User.objects.select_related('stats'),
+                       username=username)
+
+
+def get_post(request, post_id):
+    return page_object(
+        request, Post.objects.select_related('author__stats', 'group'),
+        pk=post_id
+    )
+
+
+def index_etag(request):
+    return view_etag(request, ['index'])
+
+
+def group_etag(request, slug):
+    group = get_group(request, slug)
+    return view_etag(request, [f'group:{group.pk}'])
+
+
+def profile_etag(request, username):
+    author = get_author(request, username)
+    feeds = [f'profile:{author.pk}', f'stats:{author.pk}']
+    if request.user.is_authenticated:
+        feeds.append(f'follow:{request.user.pk}')
+    return view_etag(request, feeds)
+
+
+def post_detail_etag(request, post_id):
+    post = get_post(request, post_id)
+    return view_etag(request, [f'post:{post.pk}',
+                               f'profile:{post.author_id}'])
+
+
+@read_from_replica
+@condition(etag_func=index_etag)
 def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    context = get_page_context(post_list, request)
+    post_list = Post.objects.for_feed()
+    context = get_page_context(post_list, request, ['index'])
     return render(request, 'posts/index.html', context)
 
 
+@read_from_replica
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('author')
+    group = get_group(request, slug)
+    post_list = group.posts.for_feed()
     context = {
         'group': group,
     }
-    context.update(get_page_context(post_list, request))
+    context.update(
+        get_page_context(post_list, request, [f'group:{group.pk}'])
+    )
     return render(request, 'posts/group_list.html', context)
 
 
+@read_from_replica
+@condition(etag_func=profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
+    author = get_author(request, username)
+    author_posts = author.posts.for_feed()
     following = (
         request.user.is_authenticated and Follow.objects.filter(
             user=request.user, author=author).exists()
     )
+    author_stats = AuthorStats.objects.for_author(author)
     context = {
         'following': following,
-        'author': author
+        'author': author,
+        'author_stats': author_stats,
     }
-    context.update(get_page_context(author_posts, request))
+    context.update(get_page_context(
+        author_posts, request, [f'profile:{author.pk}'],
+        count=author_stats.posts_count
+    ))
     return render(request, 'posts/profile.html', context)
 
 
+@condition(etag_func=post_detail_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_post(request, post_id)
+    attach_thumbnails([post])
     form = CommentForm()
-    comments = post.comments.select_related('author')
+    comments, comments_next = keyset_window(
+        post.comments.select_related('author'), COMMENTS_WINDOW,
+        request.GET.get('after')
+    )
     context = {
         'post': post,
+        'author_stats': AuthorStats.objects.for_author(post.author),
         'comments': comments,
+        'comments_next': comments_next,
         'form': form
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующее окно комментариев поста: HTML-фрагмент для подгрузки
+    на странице поста или JSON при ?format=json."""
+    post = get_object_or_404(Post.objects.only('comments_count'), pk=post_id)
+    comments, comments_next = keyset_window(
+        post.comments.select_related('author'), COMMENTS_WINDOW,
+        request.GET.get('after')
+    )
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'count': post.comments_count,
+            'next': comments_next,
+            'comments': [comment_row(comment) for comment in comments],
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+        'comments_next': comments_next,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    ids = search_posts(query) if query else []
+    page_obj = Paginator(ids, COUNT_OBJ).get_page(request.GET.get('page'))
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    page_obj.page_window = page_window(page_obj)
+    attach_thumbnails(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@pin_to_primary
 def post_create(request):
     template_name = 'posts/create_post.html'
     if request.method == 'POST':
-        form = PostForm(request.POST)
+        form = PostForm(request.POST, files=request.FILES or None)
         if form.is_valid():
             new_post = form.save(commit=False)
             new_post.author = request.user
             new_post.save()
+            schedule_thumbnails(new_post)
             return redirect('posts:profile', username=request.user)
         return render(request, template_name, {'form': form})
     form = PostForm()
@@ -78,6 +219,7 @@ def post_create(request):
 
 
 @login_required
+@pin_to_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
@@ -85,13 +227,19 @@ def post_edit(request, post_id):
     form = PostForm(request.POST or None, instance=post,
                     files=request.FILES or None)
     if form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        if 'image' in form.changed_data:
+            post.image_variants = ''
+        post.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnails(post)
         return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html',
                   {'form': form, 'is_edit': True, 'post_id': post_id})
 
 
 @login_required
+@pin_to_primary
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -104,13 +252,23 @@ def add_comment(request, post_id):
 
 
 @login_required
+@read_from_replica
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = (get_page_context(posts, request))
+    celebrities = followed_celebrities(request.user)
+    posts = follow_feed(request.user, celebrities).for_feed()
+    feeds = [f'follow:{request.user.pk}']
+    feeds.extend(f'profile:{author_id}' for author_id in celebrities)
+    sources = None
+    if celebrities:
+        sources = [source.for_feed()
+                   for source in follow_sources(request.user, celebrities)]
+    context = get_page_context(posts, request, feeds, FEED_KEYS,
+                               sources=sources)
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@pin_to_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -119,6 +277,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@pin_to_primary
 def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
@@ -0,0 +1,65 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks.queue import Worker
+
+
+def run_worker(number, burst):
+    worker = Worker(name=f'worker-{number}')
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    try:
+        return worker.run(burst=burst)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.TASKS_WORKERS,
+            help='Число процессов-воркеров'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда в очереди не останется готовых задач'
+        )
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        burst = options['burst']
+        if processes == 1:
+            done = run_worker(1, burst)
+            self.stdout.write(self.style.SUCCESS(
+                f'Выполнено задач: {done}'))
+            return
+        # Соединения родителя не должны достаться дочерним процессам.
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=run_worker, args=(number, burst))
+            for number in range(1, processes + 1)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Запущено воркеров: {processes}')
+
+        def stop(*args):
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Ctrl+C уже получили все процессы группы.
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS('Воркеры остановлены'))
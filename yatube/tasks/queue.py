@@ -0,0 +1,168 @@
+"""Очередь фоновых задач в таблице базы данных.
+
+Функция, обёрнутая в @task, ставится в очередь вызовом delay(). Запись
+о задаче пишется в той же транзакции, что и данные, из-за которых она
+нужна, поэтому воркер увидит её только после фиксации, а откат
+транзакции отменит и задачу. Аргументы задач сериализуются в JSON.
+
+Воркеры (manage.py run_workers) забирают задачи условным UPDATE,
+который проходит только у одного из них, и на время TASKS_LEASE
+становятся их владельцами: задача упавшего воркера по истечении срока
+достанется другому. Упавшая задача повторяется через
+TASKS_RETRY_DELAY * 2 ** (попытка - 1) секунд, пока не исчерпает
+попытки.
+
+При TASKS_EAGER задачи выполняются сразу при постановке, как в тестах
+и в разработке без воркеров.
+"""
+import json
+import logging
+import os
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, max_attempts=None):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def delay(self, *args, countdown=0):
+        """Ставит вызов в очередь, возвращает Job или None при
+        TASKS_EAGER."""
+        return enqueue(self.name, args, countdown)
+
+    def is_queued(self):
+        """Ждёт ли в очереди вызов этой задачи."""
+        return Job.objects.filter(name=self.name, status=Job.QUEUED).exists()
+
+    def get_max_attempts(self):
+        return self.max_attempts or settings.TASKS_MAX_ATTEMPTS
+
+
+def task(func=None, *, max_attempts=None):
+    """Регистрирует функцию как задачу очереди."""
+    if func is None:
+        return lambda func: task(func, max_attempts=max_attempts)
+    registered = Task(func, max_attempts)
+    _registry[registered.name] = registered
+    return registered
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def enqueue(name, args=(), countdown=0):
+    if settings.TASKS_EAGER:
+        try:
+            _registry[name](*args)
+        except Exception:
+            logger.exception('Задача %s упала', name)
+        return None
+    return Job.objects.create(
+        name=name, args=json.dumps(list(args)),
+        run_at=timezone.now() + timedelta(seconds=countdown)
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(
+        seconds=settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+class Worker:
+    """Забирает и выполняет задачи по одной."""
+
+    def __init__(self, name=None, batch_size=10):
+        self.name = name or f'worker-{os.getpid()}'
+        self.batch_size = batch_size
+        self.stopping = False
+
+    def available(self, now):
+        return Job.objects.filter(
+            Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(status=Job.RUNNING, locked_until__lt=now)
+        )
+
+    def claim(self):
+        """Следующая готовая задача, уже закреплённая за воркером,
+        или None."""
+        now = timezone.now()
+        candidates = list(self.available(now).order_by(
+            'run_at', 'pk').values_list('pk', flat=True)[:self.batch_size])
+        for pk in candidates:
+            claimed = self.available(now).filter(pk=pk).update(
+                status=Job.RUNNING,
+                locked_until=now + timedelta(seconds=settings.TASKS_LEASE),
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return Job.objects.get(pk=pk)
+        return None
+
+    def execute(self, job):
+        registered = get_task(job.name)
+        try:
+            if registered is None:
+                raise LookupError(f'Неизвестная задача {job.name}')
+            registered(*json.loads(job.args))
+        except Exception:
+            logger.exception('%s: задача %s упала', self.name, job)
+            job.last_error = traceback.format_exc()
+            job.locked_until = None
+            if (registered is None
+                    or job.attempts >= registered.get_max_attempts()):
+                job.status = Job.FAILED
+            else:
+                job.status = Job.QUEUED
+                job.run_at = timezone.now() + retry_delay(job.attempts)
+            job.save(update_fields=[
+                'status', 'run_at', 'locked_until', 'last_error'])
+        else:
+            job.delete()
+
+    def run_once(self):
+        """Выполняет одну задачу, False — если готовых нет."""
+        close_old_connections()
+        job = self.claim()
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def run(self, burst=False):
+        """Выполняет задачи до stop(), при burst — пока очередь не опустеет.
+
+        Возвращает число выполненных задач.
+        """
+        done = 0
+        while not self.stopping:
+            if self.run_once():
+                done += 1
+            elif burst:
+                break
+            else:
+                time.sleep(settings.TASKS_POLL_INTERVAL)
+        return done
+
+    def stop(self, *args):
+        """Останавливает цикл после текущей задачи."""
+        self.stopping = True
@@ -24,7 +24,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '(_i2wp39&8=1q5u06@@v_%kifvf5&nhci3it_$si55exnx9+++'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'tasks.apps.TasksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,12 +66,27 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+# Без DEBUG разобранные шаблоны кэшируются в памяти процесса и не
+# читаются с диска на каждый include.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
+# Замеры рендеринга каждого шаблона и include для /metrics/.
+# Отчёт по ним без сервера строит manage.py profile_templates.
+TEMPLATE_PROFILING = os.environ.get('TEMPLATE_PROFILING') == '1'
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -90,27 +107,180 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:main_page'
 
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма копятся в outbox и уходят пачками из фоновой задачи через
+# EMAIL_DELIVERY_BACKEND: в разработке в файлы, в бою по SMTP.
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+EMAIL_DELIVERY_BACKEND = os.environ.get(
+    'EMAIL_DELIVERY_BACKEND',
+    'django.core.mail.backends.filebased.EmailBackend'
+)
+EMAIL_OUTBOX_BATCH = 100
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
 
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 
+# Авторы с таким числом подписчиков не раскладываются по лентам
+# при публикации, их посты подмешиваются в ленту при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+
+
+# Сколько последних постов автора попадает в ленту сразу при подписке,
+# остальные дораскладывает фоновая задача.
+TIMELINE_BACKFILL_SIZE = 500
+
+
+# Миниатюры картинок постов, которые создаются в фоне после загрузки.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+
+# Ширины и форматы адаптивных версий картинок постов, которые
+# сохраняются рядом с оригиналом. Форматы, которые не умеет
+# сохранять установленный Pillow, пропускаются.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+
+
+# Очередь фоновых задач. Задачи выполняет manage.py run_workers
+# в TASKS_WORKERS процессах. Для разработки без воркеров TASKS_EAGER=1
+# выполняет их сразу в запросе, так же работают тесты. Упавшая задача
+# повторяется до TASKS_MAX_ATTEMPTS раз с паузой
+# TASKS_RETRY_DELAY * 2 ** (попытка - 1) секунд, задача, которую воркер
+# не завершил за TASKS_LEASE секунд, достаётся другому.
+TASKS_EAGER = os.environ.get('TASKS_EAGER') == '1'
+TASKS_WORKERS = 2
+TASKS_MAX_ATTEMPTS = 5
+TASKS_RETRY_DELAY = 10
+TASKS_LEASE = 300
+TASKS_POLL_INTERVAL = 1
+
+
+# Представления, замеры которых копятся в гистограммах /metrics/.
+# Страницу видят сотрудники и сборщик метрик с заголовком
+# Authorization: Bearer METRICS_TOKEN; без токена — только сотрудники.
+METRICS_NAMESPACES = ('posts', 'users')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+# Кэш общий для всех воркеров, перед ним LRU в памяти каждого процесса.
+# Общий уровень — любой бэкенд Django (memcached в бою), по умолчанию
+# файловый. Поколения лент читаются только из общего уровня.
+# В нём лежат карточки постов, списки страниц и записи миниатюр, поэтому
+# MAX_ENTRIES выставлен под них, а не по умолчанию Django (300).
+# Файловый кэш перебирает каталог при каждой записи, он годится только
+# для разработки.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'LOCAL_TIMEOUT': 5,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'SHARED_PREFIXES': ('feed_gen:',),
+        },
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+        'TIMEOUT': 60 * 60 * 6,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 20000)),
+        },
+    },
 }
+
+# Тесты не трогают общий кэш разработки: их cache.clear() стёр бы его
+# у запущенного из того же каталога сервера.
+TEST_CACHES = dict(CACHES, shared={
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'tests',
+    'TIMEOUT': 60 * 60 * 6,
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+})
+TEST_RUNNER = 'core.testing.TestRunner'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# Профиль базы задаёт окружение: SQLite по умолчанию, PostgreSQL при
+# DB_ENGINE=postgresql (нужен psycopg2). Соединение живёт
+# DB_CONN_MAX_AGE секунд и переиспользуется запросами воркера.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'yatube'),
+            'USER': os.environ.get('DB_USER', 'yatube'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # Пул соединений держит PgBouncer. В режиме transaction он
+            # не переносит серверные курсоры, которые открывает iterator().
+            'DISABLE_SERVER_SIDE_CURSORS': (
+                os.environ.get('DB_PGBOUNCER') == '1'
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get(
+                'DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+            ),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        }
     }
+
+# Реплики только для чтения: через запятую имена файлов SQLite или
+# хосты PostgreSQL. В тестах реплики смотрят в тестовую базу default.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        **{'NAME' if DB_ENGINE == 'sqlite3' else 'HOST': replica},
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает только из default.
+REPLICA_PIN_SECONDS = 5
+
+# PRAGMA для каждого нового соединения SQLite. В WAL читатели не ждут
+# писателя, synchronous=NORMAL в WAL не теряет целостность и снимает
+# fsync с каждой транзакции, busy_timeout заставляет писателей ждать
+# блокировку, а не падать с database is locked.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
 }
 
+# Поисковый индекс постов и максимум результатов одного поиска.
+# FTS5 есть только в SQLite, на других базах поиск идёт подстрокой.
+POST_SEARCH_BACKEND = (
+    'posts.search.SQLiteFTSBackend' if DB_ENGINE == 'sqlite3'
+    else 'posts.search.SubstringBackend'
+)
+POST_SEARCH_LIMIT = 1000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators